@@ -0,0 +1,39 @@
+"""
+Closure and reduction engine: Closure on DAGs, an incremental update, and a Quotient of MDB.strict.
+
+    python -m bench.closure [N ...]
+
+`dense` orders every pair, the densest DAG there is; `sparse` gives each node
+five random successors. `update` rewrites the rows of 1% of the nodes of the
+sparse graph. `strict` derives the asserted order of a synthetic database
+from its follow sets and `quotient` condenses it.
+"""
+import random
+import sys
+
+from bench.common import database, row, timed
+from plugin_oracle.util.bits import full, mask
+from plugin_oracle.util.ml.graph import Closure, Quotient
+
+def sparse(n: int, degree: int, rng: random.Random) -> list[int]:
+    return [mask(rng.sample(range(i + 1, n), min(degree, n - i - 1))) for i in range(n)]
+
+def main(argv: list[str]) -> int:
+    sizes = [int(a) for a in argv] or [1000, 5000]
+    rng = random.Random(0)
+    row('nodes', 'dense', 'sparse', 'update', 'strict', 'quotient')
+    for n in sizes:
+        t_dense, _ = timed(lambda n=n: Closure(full(n) & ~full(i + 1) for i in range(n)))
+        rows = sparse(n, 5, rng)
+        t_sparse, c = timed(lambda rows=rows: Closure(rows))
+        changed = {i: mask(rng.sample(range(i + 1, n), min(5, n - i - 1))) for i in rng.sample(range(n), n // 100)}
+        t_update, _ = timed(lambda c=c, changed=changed: c.update(changed), 1)
+        db = database(n)
+        slots = list(range(len(db)))
+        t_strict, strict = timed(lambda db=db, slots=slots: db.strict(slots), 1)
+        t_quotient, _ = timed(lambda strict=strict, slots=slots: Quotient(strict, slots))
+        row(str(n), f'{t_dense:.2f} s', f'{t_sparse * 1e3:.0f} ms', f'{t_update * 1e3:.0f} ms', f'{t_strict:.2f} s', f'{t_quotient:.2f} s')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
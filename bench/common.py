@@ -0,0 +1,40 @@
+"""Helpers shared by the benchmark scripts."""
+import random
+from collections.abc import Callable
+from time import perf_counter
+from typing import TypeVar
+
+from plugin_oracle.base.db import MDB
+
+T = TypeVar('T')
+
+def timed(fn: Callable[[], T], repeat: int = 3) -> tuple[float, T]:
+    """Best wall time of `repeat` calls of `fn`, and its last result."""
+    t0 = perf_counter()
+    out = fn()
+    best = perf_counter() - t0
+    for _ in range(repeat - 1):
+        t0 = perf_counter()
+        out = fn()
+        best = min(best, perf_counter() - t0)
+    return best, out
+
+def hashes(n: int, salt: int = 0) -> list[bytes]:
+    return [(salt << 32 | i).to_bytes(32, 'little') for i in range(n)]
+
+def database(n: int, runs: int = 40, seed: int = 0) -> MDB:
+    """A database over `n` mods that has seen `runs` mostly working orders, each a shuffle of a base order."""
+    rng = random.Random(seed)
+    hs = hashes(n)
+    db = MDB()
+    _ = db.register_many(hs)
+    for _ in range(runs):
+        # Near the base order, so the learned relation is a deep partial order.
+        order = sorted(hs, key=lambda h: int.from_bytes(h, 'little') + rng.gauss(0, n / 20))
+        if rng.random() < 0.3:
+            order = [order[i] for i in sorted(rng.sample(range(n), rng.randint(n // 2, n)))]
+        _ = db.observe(rng.random() < 0.8, order)
+    return db
+
+def row(label: str, *cols: str) -> None:
+    print(f'{label:>12}  ' + '  '.join(f'{c:>14}' for c in cols))
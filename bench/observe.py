@@ -0,0 +1,35 @@
+"""
+Recording one run: MDB.observe on bitset rows against the original nested discard loops.
+
+    python -m bench.observe [N ...]
+"""
+import random
+import sys
+
+from bench.common import hashes, row, timed
+from plugin_oracle.base.db import MDB
+
+def discard(fsets: dict[bytes, set[bytes]], order: list[bytes]) -> None:
+    for i, h in enumerate(order):
+        fset = fsets[h]
+        for prev in order[:i]:
+            fset.discard(prev)
+
+def main(argv: list[str]) -> int:
+    sizes = [int(a) for a in argv] or [500, 1500, 5000]
+    rng = random.Random(0)
+    row('mods', 'observe', 'replay x20', 'sets')
+    for n in sizes:
+        hs = hashes(n)
+        db = MDB()
+        _ = db.register_many(hs)
+        orders = [rng.sample(hs, n) for _ in range(20)]
+        t_observe, _ = timed(lambda db=db, order=orders[0]: db.observe(True, order), 1)
+        t_replay, _ = timed(lambda db=db, orders=orders: db.replay((True, o) for o in orders), 1)
+        fsets = {h: set(hs) - {h} for h in hs}
+        t_sets, _ = timed(lambda fsets=fsets, order=orders[0]: discard(fsets, order), 1)
+        row(str(n), f'{t_observe * 1e3:.1f} ms', f'{t_replay * 1e3:.1f} ms', f'{t_sets * 1e3:.1f} ms')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
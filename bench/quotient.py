@@ -0,0 +1,37 @@
+"""
+Keeping the quotient current across a run: updating it in place against rebuilding it.
+
+    python -m bench.quotient [N ...]
+
+Each size starts from a synthetic database, records one more shuffled run
+and brings the quotient of all its mods up to date both ways.
+"""
+import random
+import sys
+
+from bench.common import database, row, timed
+from plugin_oracle.util.ml.graph import Quotient
+
+def main(argv: list[str]) -> int:
+    sizes = [int(a) for a in argv] or [1500, 5000]
+    rng = random.Random(0)
+    row('mods', 'removed', 'update', 'rebuild')
+    for n in sizes:
+        db = database(n)
+        slots = list(range(len(db)))
+        q = Quotient(db.strict(slots), slots)
+        version = db.version
+        order = [db.hash(s) for s in slots]
+        # A run close to what was seen before, as most are.
+        order.sort(key=lambda h: int.from_bytes(h, 'little') + rng.gauss(0, n / 10))
+        _ = db.observe(True, order)
+        removed = db.removed_since(version)
+        assert removed is not None
+        t_update, _ = timed(lambda db=db, q=q, removed=removed: q.update(db.strict_changes(q.rows, q.of, removed)), 1)
+        t_rebuild, fresh = timed(lambda db=db, slots=slots: Quotient(db.strict(slots), slots), 1)
+        assert sorted(map(sorted, q.members)) == sorted(map(sorted, fresh.members))
+        row(str(n), str(sum(x.bit_count() for _, x in removed)), f'{t_update:.3f} s', f'{t_rebuild:.2f} s')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,49 @@
+"""
+Registering new mods: MDB.register_many against one mod at a time.
+
+    python -m bench.register [N ...]
+
+`sets` is the original scheme, where every new mod was added to the follow
+and incomparability set of every known mod and vice versa.
+"""
+import sys
+
+from bench.common import hashes, row, timed
+from plugin_oracle.base.db import MDB
+
+def bulk(hs: list[bytes]) -> MDB:
+    db = MDB()
+    _ = db.register_many(hs)
+    return db
+
+def single(hs: list[bytes]) -> MDB:
+    db = MDB()
+    for h in hs:
+        _ = db.mod_req(h)
+    return db
+
+def sets(hs: list[bytes]) -> dict[bytes, set[bytes]]:
+    fsets: dict[bytes, set[bytes]] = {}
+    isets: dict[bytes, set[bytes]] = {}
+    for h in hs:
+        fsets[h] = set(fsets)
+        isets[h] = set(isets)
+        for other in fsets:
+            if other != h:
+                fsets[other].add(h)
+                isets[other].add(h)
+    return fsets
+
+def main(argv: list[str]) -> int:
+    sizes = [int(a) for a in argv] or [500, 2000, 5000]
+    row('mods', 'register_many', 'one at a time', 'sets')
+    for n in sizes:
+        hs = hashes(n)
+        t_bulk, _ = timed(lambda hs=hs: bulk(hs))
+        t_single, _ = timed(lambda hs=hs: single(hs), 1)
+        t_sets, _ = timed(lambda hs=hs: sets(hs), 1)
+        row(str(n), f'{t_bulk * 1e3:.1f} ms', f'{t_single * 1e3:.1f} ms', f'{t_sets * 1e3:.1f} ms')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
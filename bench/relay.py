@@ -0,0 +1,36 @@
+"""
+Relay export size and speed against a db.bin checkpoint and the legacy db.pkl.
+
+    python -m bench.relay [N ...]
+"""
+import os
+import pickle
+import sys
+import tempfile
+
+from bench.common import database, row, timed
+from plugin_oracle.base.db import MDB
+
+def main(argv: list[str]) -> int:
+    sizes = [int(a) for a in argv] or [1000, 3000, 5000]
+    row('mods', 'db.pkl', 'db.bin', '.orx', 'export', 'import')
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in sizes:
+            db = database(n)
+            path = os.path.join(tmp, str(n))
+            db.checkpoint(path)
+            # What the legacy pickle held: a follow and incomparability set per mod.
+            pkl = os.path.join(path, 'db.pkl')
+            with open(pkl, 'wb') as f:
+                pickle.dump({h: (set(db.fsets[h]), set(db._isets[h])) for h in db.fsets}, f) # pyright: ignore [reportPrivateUsage]
+            orx = path + '.orx'
+            t_export, _ = timed(lambda db=db, orx=orx: db.export(orx))
+            out = MDB()
+            t_import, _ = timed(lambda out=out, orx=orx: out.import_(orx))
+            assert list(out.rows()) == list(db.rows()) and list(out.rows(False)) == list(db.rows(False))
+            row(str(n), f'{os.path.getsize(pkl) >> 10} KB', f'{os.path.getsize(path + MDB._fname) >> 10} KB', # pyright: ignore [reportPrivateUsage]
+                f'{os.path.getsize(orx) >> 10} KB', f'{t_export:.2f} s', f'{t_import:.2f} s')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,50 @@
+"""
+Random topological sorts: the swap-pop engine against the original list.pop(randrange) one.
+
+    python -m bench.toposort [N ...]
+
+Each size is timed on an edgeless graph, the widest case, and on a random
+DAG with five edges per node. `x20` draws twenty distinct sorts in a batch.
+"""
+import random
+import sys
+from collections.abc import Iterable, Mapping
+
+from bench.common import hashes, row, timed
+from plugin_oracle.util.ml.graph import random_toposort, random_toposorts
+
+def pop(adj: Mapping[bytes, Iterable[bytes]], rng: random.Random) -> list[bytes] | None:
+    indegree = {k: 0 for k in adj}
+    for vs in adj.values():
+        for v in vs:
+            indegree[v] = indegree.get(v, 0) + 1
+    queue = [k for k, deg in indegree.items() if deg == 0]
+    L: list[bytes] = []
+    while queue:
+        n = queue.pop(rng.randrange(len(queue)))
+        L.append(n)
+        for m in adj.get(n, ()):
+            indegree[m] -= 1
+            if indegree[m] == 0:
+                queue.append(m)
+    return L if len(L) == len(indegree) else None
+
+def dag(n: int, degree: int, rng: random.Random) -> dict[bytes, list[bytes]]:
+    hs = hashes(n)
+    rng.shuffle(hs)
+    return {h: [hs[j] for j in rng.sample(range(i + 1, n), min(degree, n - i - 1))] for i, h in enumerate(hs)}
+
+def main(argv: list[str]) -> int:
+    sizes = [int(a) for a in argv] or [5000, 50000, 200000]
+    rng = random.Random(0)
+    row('nodes', 'graph', 'new', 'old', 'new x20')
+    for n in sizes:
+        for name, adj in (('edgeless', {h: [] for h in hashes(n)}), ('5 per node', dag(n, 5, rng))):
+            t_new, _ = timed(lambda adj=adj: random_toposort(adj, rng=rng))
+            t_old, _ = timed(lambda adj=adj: pop(adj, rng))
+            t_batch, _ = timed(lambda adj=adj: list(random_toposorts(adj, 20, rng=rng)), 1)
+            row(str(n), name, f'{t_new * 1e3:.0f} ms', f'{t_old * 1e3:.0f} ms', f'{t_batch * 1e3:.0f} ms')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -1,7 +1,17 @@
-from mobase import IPlugin # pyright: ignore [reportMissingModuleSource]
-from plugin_oracle.plugin.oracle import OraclePlugin
+from typing import TYPE_CHECKING
 
-def createPlugins() -> list[IPlugin]:
+if TYPE_CHECKING:
+    from mobase import IPlugin  # pyright: ignore [reportMissingModuleSource]
+
+def createPlugins() -> list['IPlugin']:
+    from time import time
+
+    from plugin_oracle.util.log import PluginLogger, getLogger
+    t0 = time()
+    # Imported here so the package can be used outside MO2, e.g. plugin_oracle.base.merge
+    from plugin_oracle.plugin.oracle import OraclePlugin
+    t1 = time()
+    PluginLogger(getLogger(__name__), {'name': 'Oracle'}).info(f'Imported plugin in {t1 - t0}s')
     master = OraclePlugin()
     children: list[IPlugin] = []
     return [master] + children
@@ -1,62 +1,529 @@
+import mmap
 import os
 import pickle
+import struct
+from collections.abc import Callable, Container, Iterable, Iterator, Mapping, MutableSet, Sequence
 
+from plugin_oracle.base import relay, store
+from plugin_oracle.base.journal import Journal
+from plugin_oracle.base.store import Rows
+from plugin_oracle.util.bits import bits, full, mask, prefixes
 from plugin_oracle.util.mod import Mod
 
+_u32: struct.Struct = struct.Struct('<I')
+
+class FSet(MutableSet[bytes]):
+    """Live set view over a single bitset row of an MDB."""
+
+    def __init__(self, db: 'MDB', slot: int, inv: bool = True) -> None:
+        self._db: MDB = db
+        self._slot: int = slot
+        self._inv: bool = inv
+
+    @property
+    def row(self) -> int:
+        return self._db.rows(self._inv)[self._slot]
+
+    def __contains__(self, x: object) -> bool:
+        s = self._db.slot(x) if isinstance(x, bytes) else None
+        return s is not None and (self.row >> s) & 1 == 1
+
+    def __iter__(self) -> Iterator[bytes]:
+        return iter(self._db.hashes(self.row))
+
+    def __len__(self) -> int:
+        return self.row.bit_count()
+
+    def add(self, value: bytes) -> None:
+        s = self._db.slot(value)
+        if s is None:
+            raise ValueError(f"Mod with hash {value} not found")
+        self._db.rows(self._inv)[self._slot] |= 1 << s
+        self._db._changed() # pyright: ignore [reportPrivateUsage]
+
+    def discard(self, value: bytes) -> None:
+        s = self._db.slot(value)
+        if s is not None:
+            self._db.rows(self._inv)[self._slot] &= ~(1 << s)
+            self._db._changed({self._inv: [(self._slot, 1 << s)]}) # pyright: ignore [reportPrivateUsage]
+
+class FSets(Mapping[bytes, FSet]):
+    """Read-only dict-of-sets view over the bitset rows of an MDB."""
+
+    def __init__(self, db: 'MDB', inv: bool = True) -> None:
+        self._db: MDB = db
+        self._inv: bool = inv
+
+    def __getitem__(self, key: bytes) -> FSet:
+        s = self._db.slot(key)
+        if s is None:
+            raise KeyError(key)
+        return FSet(self._db, s, self._inv)
+
+    def __iter__(self) -> Iterator[bytes]:
+        return iter(self._db._hashes) # pyright: ignore [reportPrivateUsage]
+
+    def __len__(self) -> int:
+        return len(self._db._hashes) # pyright: ignore [reportPrivateUsage]
+
 class MDB:
-    _fname: str = '/db.pkl'
+    _fname: str = '/db.bin'
+    _legacy: str = '/db.pkl'
+    _hsz: int = 32
+    # Journal size past which save() folds it into a fresh checkpoint.
+    _jlimit: int = 1 << 20
+    # Batches of follow set removals kept for `removed_since`.
+    _rlimit: int = 16
 
     def __init__(self) -> None:
         self.mods: dict[bytes, Mod] = {}
-        self.fsets: dict[bytes, set[bytes]] = {}
-        self._isets: dict[bytes, set[bytes]] = {}
-
-    def fset(self, hash: bytes, inv: bool = True) -> set[bytes] | None:
-        if not inv:
-            return self._isets.get(hash, None)
-        return self.fsets.get(hash, None)
-    
+        # Every known hash owns a dense slot; follow sets are bitset rows indexed by slot.
+        self._slots: dict[bytes, int] = {}
+        self._hashes: list[bytes] = []
+        self._frows: Rows = Rows()
+        self._irows: Rows = Rows()
+        self._buf: mmap.mmap | None = None
+        self.fsets: FSets = FSets(self, True)
+        self._isets: FSets = FSets(self, False)
+        self._journal: Journal | None = None
+        self._pending: list[tuple[bytes, bytes]] = []
+        # Bumped on every change to the rows, so derived results can be cached against it.
+        self.version: int = 0
+        # Recent follow set removals by version, complete for every version from `_since` on.
+        self._removals: list[tuple[int, list[tuple[int, int]]]] = []
+        self._since: int = 0
+
+    def __len__(self) -> int:
+        return len(self._hashes)
+
+    def rows(self, inv: bool = True) -> Rows:
+        return self._frows if inv else self._irows
+
+    def _changed(self, removed: Mapping[bool, list[tuple[int, int]]] | None = None) -> None:
+        """Bump the version after rows only lost the `removed` bits, or after anything at all with None."""
+        self.version += 1
+        if removed is None:
+            self._removals.clear()
+            self._since = self.version
+        elif removed.get(True, None):
+            self._removals.append((self.version, removed[True]))
+            if len(self._removals) > MDB._rlimit:
+                drop = len(self._removals) // 2
+                self._since = self._removals[drop - 1][0]
+                del self._removals[:drop]
+
+    def removed_since(self, version: int) -> list[tuple[int, int]] | None:
+        """
+        The (slot, bits) dropped from follow sets since `version`, or None if that is no longer known.
+
+        None too when the rows were replaced or grew bits in the meantime.
+        Registering mods adds rows without touching existing pairs, so it does
+        not count.
+        """
+        if version < self._since:
+            return None
+        return [x for v, removed in self._removals if v > version for x in removed]
+
+    def slot(self, hash: bytes) -> int | None:
+        return self._slots.get(hash, None)
+
+    def slots(self, hashes: Iterable[bytes]) -> list[int]:
+        out: list[int] = []
+        for hash in hashes:
+            s = self._slots.get(hash, None)
+            if s is None:
+                raise ValueError(f"Mod with hash {hash} not found")
+            out.append(s)
+        return out
+
+    def mask(self, hashes: Iterable[bytes]) -> int:
+        """Bitset of the known hashes in `hashes`; unknown hashes are ignored."""
+        slots = self._slots
+        return mask(slots[h] for h in hashes if h in slots)
+
+    def strict(self, slots: list[int]) -> dict[int, int]:
+        """
+        Rows of the order the follow sets actually assert among `slots`.
+
+        `a` must precede `b` when `b` is in the follow set of `a` but `a` is not
+        in that of `b`. Pairs in both were never seen together and pairs in
+        neither were seen both ways round, so neither constrains anything.
+        """
+        rows = self._frows
+        within = mask(slots)
+        out = {s: rows[s] & within for s in slots}
+        # Transpose the sparser of the follow sets and their complements.
+        dense = sum(r.bit_count() for r in out.values())
+        tr = dict.fromkeys(slots, 0)
+        if 2 * dense <= len(slots) * len(slots):
+            for a, r in out.items():
+                for b in bits(r):
+                    tr[b] |= 1 << a
+            return {s: r & ~tr[s] for s, r in out.items()}
+        for a, r in out.items():
+            for b in bits(within & ~r):
+                tr[b] |= 1 << a
+        return {s: r & tr[s] for s, r in out.items()}
+
+    def strict_changes(self, rows: Sequence[int], nodes: Container[int], removed: list[tuple[int, int]]) -> dict[int, int]:
+        """
+        New `strict` rows among `nodes` after follow set `removed`, given the `rows` from before.
+
+        Only the rows the removals touch are returned. Dropping `b` from the
+        follow set of `a` takes `b` out of `a`'s strict row, and puts `a` into
+        `b`'s if `a` is still in the follow set of `b`.
+        """
+        frows = self._frows
+        out: dict[int, int] = {}
+        for a, x in removed:
+            if a not in nodes:
+                continue
+            out[a] = out.get(a, rows[a]) & ~x
+            for b in bits(x):
+                if b in nodes and (frows[b] >> a) & 1:
+                    out[b] = out.get(b, rows[b]) | 1 << a
+        return out
+
+    def hash(self, slot: int) -> bytes:
+        return self._hashes[slot]
+
+    def hashes(self, row: int) -> list[bytes]:
+        return [self._hashes[i] for i in bits(row)]
+
+    def fset(self, hash: bytes, inv: bool = True) -> FSet | None:
+        s = self._slots.get(hash, None)
+        if s is None:
+            return None
+        return FSet(self, s, inv)
+
     def mod(self, hash: bytes, create: bool = False) -> Mod | None:
         m = self.mods.get(hash, None)
         if m is None:
             if not create:
                 return None
-            m = Mod(hash)
-            self.mods[hash] = m
-            self.fsets[hash] = self.fsets.get(hash, set())
-            self.fsets[hash].update(self.mods.keys())
-            self.fsets[hash].discard(hash)
-            for k in self.mods.keys():
-                if k != hash:
-                    self.fsets[k].add(hash)
-            self._isets[hash] = self._isets.get(hash, set())
-            self._isets[hash].update(self.mods.keys())
-            self._isets[hash].discard(hash)
-            for k in self.mods.keys():
-                if k != hash:
-                    self._isets[k].add(hash)
+            m = self.register_many([hash])[0]
         return m
 
+    def register_many(self, hashes: Iterable[bytes]) -> list[Mod]:
+        """Return the mods for `hashes`, creating any unknown ones in a single pass."""
+        out: list[Mod] = []
+        new: list[bytes] = []
+        for hash in hashes:
+            m = self.mods.get(hash, None)
+            if m is None:
+                m = Mod(hash)
+                self.mods[hash] = m
+                if hash not in self._slots:
+                    self._slots[hash] = len(self._hashes) + len(new)
+                    new.append(hash)
+            out.append(m)
+        if not new:
+            return out
+        self.version += 1
+        n0 = len(self._hashes)
+        n1 = n0 + len(new)
+        self._hashes.extend(new)
+        # New mods start out able to follow and precede everything but themselves.
+        widen = full(n1) ^ full(n0)
+        for rows in (self._frows, self._irows):
+            rows.widen(widen)
+            everything = full(n1)
+            rows.extend(everything ^ (1 << s) for s in range(n0, n1))
+        return out
+
     def mod_req(self, hash: bytes) -> Mod:
         mod = self.mod(hash, True)
         if mod is None:
             raise ValueError(f"Mod with hash {hash} not found")
         return mod
-    
+
+    def observe(self, result: bool, loadorder: list[bytes]) -> list[tuple[int, int]]:
+        """
+        Drop every earlier mod of the load order from each later mod's follow set.
+
+        Returns the (slot, bits) pairs that were actually removed.
+        """
+        rows = self.rows(result)
+        removed: list[tuple[int, int]] = []
+        for s, prefix in prefixes(self.slots(loadorder)):
+            r = rows[s]
+            if r & prefix:
+                removed.append((s, r & prefix))
+                rows[s] = r & ~prefix
+        self._changed({result: removed})
+        if self._journal is not None:
+            self._pending.append((b'O', bytes([result]) + b''.join(loadorder)))
+            self.flush()
+        return removed
+
+    def remove(self, inv: bool, edges: list[tuple[bytes, list[bytes]]]) -> list[tuple[int, int]]:
+        """Drop explicit (source, targets) edges, returning the (slot, bits) actually removed."""
+        _ = self.register_many(h for src, dst in edges for h in (src, *dst))
+        rows = self.rows(inv)
+        removed: list[tuple[int, int]] = []
+        record = bytearray([inv])
+        for src, dst in edges:
+            s = self._slots[src]
+            r = rows[s]
+            x = r & self.mask(dst)
+            if x:
+                removed.append((s, x))
+                rows[s] = r & ~x
+            record += src + _u32.pack(len(dst)) + b''.join(dst)
+        self._changed({inv: removed})
+        if self._journal is not None and removed:
+            self._pending.append((b'R', bytes(record)))
+            self.flush()
+        return removed
+
+    def replay(self, runs: Iterable[tuple[bool, list[bytes]]]) -> dict[bool, list[tuple[int, int]]]:
+        """
+        Apply many observations at once.
+
+        Equivalent to calling `observe` for each run, but the predecessors of every
+        mod are first OR'd together across all runs and each row is then cleared
+        with a single AND. The result is checkpointed instead of journaled.
+        Returns the (slot, bits) removed, keyed like `rows` by `inv`.
+        """
+        before: tuple[dict[int, int], dict[int, int]] = ({}, {})
+        for result, order in runs:
+            _ = self.register_many(order)
+            acc = before[result]
+            for s, prefix in prefixes(self.slots(order)):
+                acc[s] = acc.get(s, 0) | prefix
+        removed: dict[bool, list[tuple[int, int]]] = {False: [], True: []}
+        for inv in (False, True):
+            rows = self.rows(inv)
+            for s, b in before[inv].items():
+                r = rows[s]
+                if r & b:
+                    removed[inv].append((s, r & b))
+                    rows[s] = r & ~b
+        self._changed(removed)
+        if self._journal is not None:
+            self.checkpoint(self._journal.root)
+        return removed
+
+    def reset(self) -> None:
+        """Forget everything learned, keeping the registered mods and their names."""
+        self._detach()
+        n = len(self._hashes)
+        self._frows = Rows(full(n) ^ (1 << s) for s in range(n))
+        self._irows = Rows(full(n) ^ (1 << s) for s in range(n))
+        self._changed()
+
+    def rename(self, hash: bytes, name: str) -> None:
+        m = self.mod_req(hash)
+        if m.name != name:
+            m.name = name
+            self._pending.append((b'N', hash + name.encode('utf-8')))
+
+    def flush(self) -> None:
+        """Make every pending journal record durable."""
+        if self._journal is not None:
+            self._journal.append(self._pending)
+        self._pending.clear()
+
+    def translate(self, other: 'MDB', register: bool = True) -> tuple[list[int], Callable[[int], int]]:
+        """
+        Map the slots of `other` onto ours, registering its mods first unless told not to.
+
+        Returns the slot of each of its mods here, -1 for those we do not know,
+        and a function translating one of its rows into a row over our slots.
+        Mods we do not know are dropped from translated rows.
+        """
+        if register:
+            _ = self.register_many(other._hashes)
+        remap = [self._slots.get(h, -1) for h in other._hashes]
+        m = len(remap)
+        if remap == list(range(m)):
+            return remap, lambda r: r
+        known = mask(s for s in remap if s >= 0)
+
+        def tr(r: int) -> int:
+            # Translate whichever of the row or its complement is sparser.
+            gone = full(m) & ~r
+            if gone.bit_count() < r.bit_count():
+                return known & ~mask(remap[i] for i in bits(gone) if remap[i] >= 0)
+            return mask(remap[i] for i in bits(r) if remap[i] >= 0)
+        return remap, tr
+
+    def merge(self, other: 'MDB', exclude: Container[bytes] = ()) -> dict[bool, list[tuple[int, int]]]:
+        """
+        Intersect the follow and incomparability sets of `other` into this database.
+
+        A pair only counts as evidence on a side that knows both of its mods, so
+        mods missing from either side keep what the other side learned about them.
+        The merge is commutative, associative and idempotent. Rows of `other`
+        belonging to mods in `exclude` are ignored. Returns the (slot, bits) removed,
+        keyed like `rows` by `inv`.
+        """
+        remap, tr = self.translate(other)
+        known = self.mask(other._hashes)
+        removed: dict[bool, list[tuple[int, int]]] = {False: [], True: []}
+        for inv in (True, False):
+            src = other.rows(inv)
+            dst = self.rows(inv)
+            for j, s in enumerate(remap):
+                if other._hashes[j] in exclude:
+                    continue
+                r = dst[s]
+                x = r & ~(tr(src[j]) | ~known)
+                if x:
+                    removed[inv].append((s, x))
+                    dst[s] = r & ~x
+        self._changed(removed)
+        for h in other._hashes:
+            name = other.mods[h].name if h in other.mods else h.hex()
+            mine = self.mods[h]
+            if mine.name == h.hex() and name != mine.name:
+                self.rename(h, name)
+        if self._journal is not None:
+            self.checkpoint(self._journal.root)
+        return removed
+
+    def _replay(self, journal: Journal, repair: bool = True) -> None:
+        hsz = MDB._hsz
+        for kind, payload in journal.replay(repair):
+            if kind == b'O':
+                loadorder = [payload[i:i + hsz] for i in range(1, len(payload), hsz)]
+                _ = self.register_many(loadorder)
+                self.observe(payload[0] != 0, loadorder)
+            elif kind == b'N':
+                self.mod_req(payload[:hsz]).name = payload[hsz:].decode('utf-8')
+            elif kind == b'R':
+                edges: list[tuple[bytes, list[bytes]]] = []
+                off = 1
+                while off < len(payload):
+                    src = payload[off:off + hsz]
+                    n, = _u32.unpack_from(payload, off + hsz)
+                    off += hsz + _u32.size
+                    edges.append((src, [payload[off + i * hsz:off + (i + 1) * hsz] for i in range(n)]))
+                    off += n * hsz
+                _ = self.remove(payload[0] != 0, edges)
+
     def save(self, path: str) -> None:
+        if self._journal is not None and self._journal.root == path:
+            self.flush()
+            if self._journal.size < MDB._jlimit:
+                return
+        self.checkpoint(path)
+
+    def checkpoint(self, path: str) -> None:
+        """Write a full snapshot and truncate the journal it supersedes."""
         os.makedirs(path, exist_ok=True)
-        # Serialize as a tuple: (mods, fsets)
-        dat: tuple[list[Mod], dict[bytes, set[bytes]], dict[bytes, set[bytes]]] = (list(self.mods.values()), self.fsets, self._isets)
-        with open(path + MDB._fname, 'wb') as f:
-            pickle.dump(dat, f)
-
-    def load(self, path: str) -> None:
-        path += MDB._fname
-        if os.path.exists(path):
-            with open(path, 'rb') as f:
-                dat: tuple[list[Mod], dict[bytes, set[bytes]], dict[bytes, set[bytes]]] = pickle.load(f) # pyright: ignore [reportAny]
-                mods, fsets, isets = dat
-                self.mods = {m.hash: m for m in mods}
-                self.fsets = fsets
-                self._isets = isets
+        self._detach()
+        names = [self.mods[h].name if h in self.mods else h.hex() for h in self._hashes]
+        store.write(path + MDB._fname, MDB._hsz, self._hashes, names, self._frows, self._irows)
+        self._pending.clear()
+        if self._journal is not None and self._journal.root == path:
+            self._journal.reset()
+
+    def export(self, fname: str) -> None:
+        """Write the database in the compact relay format."""
+        names = [self.mods[h].name if h in self.mods else h.hex() for h in self._hashes]
+        with open(fname, 'wb') as f:
+            _ = f.write(relay.encode(MDB._hsz, self._hashes, names, self._frows, self._irows))
+
+    def import_(self, fname: str) -> None:
+        """Replace the contents of the database with a relay export."""
+        with open(fname, 'rb') as f:
+            _, hashes, names, frows, irows = relay.decode(f.read())
+        self._detach()
+        self._hashes = hashes
+        self._slots = {h: i for i, h in enumerate(hashes)}
+        self._frows = Rows(frows)
+        self._irows = Rows(irows)
+        self._changed()
+        self.mods = {}
+        for h, name in zip(hashes, names):
+            self.mod_req(h).name = name
+        if self._journal is not None:
+            self.checkpoint(self._journal.root)
+
+    def read(self, fname: str) -> None:
+        """
+        Load a database from a data directory, a db.bin/db.pkl file or a relay export.
+
+        The source is only read: nothing is migrated, repaired or attached to.
+        """
+        if os.path.isdir(fname):
+            self.load(fname, readonly=True)
+        elif fname.endswith(MDB._legacy[1:]):
+            self._read(fname)
+        elif fname.endswith(MDB._fname[1:]):
+            self._open(fname)
+        else:
+            self.import_(fname)
+
+    def close(self) -> None:
+        """Release the mapped checkpoint without paging it in; the rows become unusable."""
+        if self._buf is not None:
+            self._buf.close()
+            self._buf = None
+
+    def load(self, path: str, readonly: bool = False) -> None:
+        """
+        Open the data directory at `path` and replay its journal.
+
+        Unless `readonly`, the journal stays attached for later changes, a torn
+        journal tail is cut off and a legacy db.pkl is migrated to db.bin.
+        """
+        self._journal = None
+        self._pending.clear()
+        migrate = False
+        if os.path.exists(path + MDB._fname):
+            self._open(path + MDB._fname)
+        elif os.path.exists(path + MDB._legacy):
+            self._read(path + MDB._legacy)
+            migrate = not readonly
+        journal = Journal(path)
+        self._replay(journal, not readonly)
+        if readonly:
+            return
+        self._journal = journal
+        if migrate:
+            # One-time upgrade; the pickle is kept aside rather than deleted.
+            self.checkpoint(path)
+            os.replace(path + MDB._legacy, path + MDB._legacy + '.migrated')
+
+    def _open(self, path: str) -> None:
+        self._detach()
+        _, hashes, names, self._frows, self._irows, self._buf = store.read(path)
+        self._hashes = hashes
+        self._slots = {h: i for i, h in enumerate(hashes)}
+        self._changed()
+        self.mods = {}
+        for h, name in zip(hashes, names):
+            m = Mod(h)
+            m.name = name
+            self.mods[h] = m
+
+    def _detach(self) -> None:
+        # The mapping has to be released before its file can be replaced.
+        if self._buf is None:
+            return
+        self._frows.detach()
+        self._irows.detach()
+        self._buf.close()
+        self._buf = None
+
+    def _read(self, path: str) -> None:
+        with open(path, 'rb') as f:
+            dat: tuple[list[Mod], list[bytes], list[int], list[int]] | tuple[list[Mod], dict[bytes, set[bytes]], dict[bytes, set[bytes]]] = pickle.load(f) # pyright: ignore [reportAny]
+        self.mods = {m.hash: m for m in dat[0]}
+        self._changed()
+        if len(dat) == 3:
+            self._from_sets(dat[1], dat[2])
+        else:
+            self._hashes = dat[1]
+            self._frows = Rows(dat[2])
+            self._irows = Rows(dat[3])
+            self._slots = {h: i for i, h in enumerate(self._hashes)}
 
+    def _from_sets(self, fsets: dict[bytes, set[bytes]], isets: dict[bytes, set[bytes]]) -> None:
+        # Legacy databases stored one python set per mod.
+        self._hashes = list(dict.fromkeys([*self.mods.keys(), *fsets.keys(), *isets.keys()]))
+        self._slots = {h: i for i, h in enumerate(self._hashes)}
+        self._frows = Rows(self.mask(fsets.get(h, ())) for h in self._hashes)
+        self._irows = Rows(self.mask(isets.get(h, ())) for h in self._hashes)
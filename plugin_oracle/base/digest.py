@@ -0,0 +1,131 @@
+import os
+import threading
+from dataclasses import dataclass
+from hashlib import file_digest, sha256
+
+from plugin_oracle.base.journal import Journal
+from plugin_oracle.util.varint import Reader, varint
+
+
+@dataclass
+class Digest:
+    size: int
+    mtime: int
+    inode: int
+    fingerprint: bytes
+    digest: bytes
+
+class DigestCache:
+    """
+    Persistent SHA-256 cache for installation archives.
+
+    A digest is reused while the archive's (path, size, mtime, inode) is
+    unchanged. Otherwise a cheap fingerprint of its size and a few sampled
+    blocks is taken first. The fingerprint only flags a candidate: the known
+    digest is kept just when the archive merely moved, e.g. with the whole
+    downloads folder, i.e. it has the same size and mtime as the matching
+    entry and that entry's file is gone. Everything else is read in full.
+    """
+    _fname: str = '/digests.idx'
+    _hsz: int = 32
+    _block: int = 1 << 16
+    _samples: int = 8
+
+    def __init__(self, path: str) -> None:
+        self._log: Journal = Journal(path, DigestCache._fname)
+        self._lock: threading.Lock = threading.Lock()
+        self._records: int = 0
+        self.entries: dict[str, Digest] = {}
+        # Fingerprint -> path of the entry it was last seen on.
+        self._prints: dict[bytes, str] = {}
+        self.hits: int = 0
+        self.matches: int = 0
+        self.misses: int = 0
+        for kind, payload in self._log.replay():
+            if kind == b'D':
+                self._records += 1
+                path, d = DigestCache._decode(payload)
+                self.entries[path] = d
+                self._prints[d.fingerprint] = path
+
+    @staticmethod
+    def _encode(path: str, d: Digest) -> bytes:
+        buf = bytearray(d.digest + d.fingerprint)
+        for v in (d.size, max(d.mtime, 0), d.inode):
+            varint(buf, v)
+        buf += path.encode('utf-8')
+        return bytes(buf)
+
+    @staticmethod
+    def _decode(payload: bytes) -> tuple[str, Digest]:
+        rd = Reader(payload)
+        hsz = DigestCache._hsz
+        digest = rd.take(hsz)
+        fingerprint = rd.take(hsz)
+        size = rd.varint()
+        mtime = rd.varint()
+        inode = rd.varint()
+        return payload[rd.off:].decode('utf-8'), Digest(size, mtime, inode, fingerprint, digest)
+
+    @staticmethod
+    def fingerprint(path: str, size: int) -> bytes:
+        """SHA-256 over the size and evenly spaced blocks of the file, first and last included."""
+        h = sha256(size.to_bytes(8, 'little'))
+        block = DigestCache._block
+        n = DigestCache._samples
+        with open(path, 'rb') as f:
+            if size <= n * block:
+                h.update(f.read())
+            else:
+                for i in range(n):
+                    _ = f.seek((size - block) * i // (n - 1))
+                    h.update(f.read(block))
+        return h.digest()
+
+    def digest(self, path: str) -> bytes:
+        """Full SHA-256 of the file at `path`, reading it only when nothing cached can stand in."""
+        st = os.stat(path)
+        with self._lock:
+            d = self.entries.get(path, None)
+            if d is not None and (d.size, d.mtime, d.inode) == (st.st_size, st.st_mtime_ns, st.st_ino):
+                self.hits += 1
+                return d.digest
+        fp = DigestCache.fingerprint(path, st.st_size)
+        digest: bytes | None = None
+        with self._lock:
+            old = self._prints.get(fp, path)
+            known = self.entries.get(old, None) if old != path else None
+        if known is not None and (known.size, known.mtime) == (st.st_size, st.st_mtime_ns) and not os.path.exists(old):
+            digest = known.digest
+        if digest is None:
+            with open(path, 'rb') as f:
+                digest = file_digest(f, sha256).digest()
+            with self._lock:
+                self.misses += 1
+        else:
+            with self._lock:
+                self.matches += 1
+        d = Digest(st.st_size, st.st_mtime_ns, st.st_ino, fp, digest)
+        with self._lock:
+            self.entries[path] = d
+            self._prints[fp] = path
+            self._log.append([(b'D', DigestCache._encode(path, d))])
+            self._records += 1
+            if self._records > 2 * len(self.entries) + 64:
+                self._compact()
+        return digest
+
+    def stats(self) -> tuple[int, int, int]:
+        """(hits, fingerprint matches, full reads) since the last call."""
+        with self._lock:
+            out = (self.hits, self.matches, self.misses)
+            self.hits = self.matches = self.misses = 0
+        return out
+
+    def _compact(self) -> None:
+        tmp = Journal(self._log.root, DigestCache._fname + '.tmp')
+        tmp.reset()
+        tmp.append((b'D', DigestCache._encode(path, d)) for path, d in self.entries.items())
+        os.replace(tmp.path, self._log.path)
+        self._log = Journal(self._log.root, DigestCache._fname)
+        self._records = len(self.entries)
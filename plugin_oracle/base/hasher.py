@@ -0,0 +1,128 @@
+import os
+import threading
+from collections import deque
+from collections.abc import Callable, Sequence
+from concurrent.futures import ThreadPoolExecutor
+from typing import Generic, TypeVar
+
+T = TypeVar('T')
+R = TypeVar('R')
+
+class _Batch(Generic[T, R]):
+    """One `Hasher.map` call: per-device queues, results and completion."""
+
+    def __init__(self, fn: Callable[[T], R], items: list[T], progress: Callable[[int, int], None] | None) -> None:
+        self.fn: Callable[[T], R] = fn
+        self.items: list[T] = items
+        self.progress: Callable[[int, int], None] | None = progress
+        self.results: list[R | None] = [None] * len(items)
+        self.error: BaseException | None = None
+        self.queues: dict[int, deque[int]] = {}
+        self.done: int = 0
+        self.finished: threading.Event = threading.Event()
+
+class Hasher:
+    """
+    Shared worker pool for reading and hashing mod archives.
+
+    Jobs are grouped by the device their file lives on, and at most
+    `per_device` of them read from one device at a time, across every batch
+    running on the pool: 1 suits a spinning disk, NVMe drives take many.
+    Within a device the largest files go first, so one huge archive does not
+    end up running alone at the end.
+    """
+
+    def __init__(self, workers: int | None = None, per_device: int = 4) -> None:
+        self.workers: int = workers or min(32, (os.cpu_count() or 1) + 4)
+        self.per_device: int = per_device
+        self._pool: ThreadPoolExecutor | None = None
+        self._lock: threading.Lock = threading.Lock()
+        # One per device, sized by `per_device` when the device is first read.
+        self._devices: dict[int, threading.Semaphore] = {}
+
+    def _executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(self.workers, thread_name_prefix='oracle-hash')
+            return self._pool
+
+    def _device(self, dev: int) -> threading.Semaphore:
+        with self._lock:
+            sem = self._devices.get(dev, None)
+            if sem is None:
+                sem = self._devices[dev] = threading.Semaphore(max(1, self.per_device))
+            return sem
+
+    def map(self, fn: Callable[[T], R], jobs: Sequence[tuple[str, T]], progress: Callable[[int, int], None] | None = None) -> list[R | None]:
+        """
+        Run `fn` over the items of `jobs`, given as (file it reads, item) pairs.
+
+        Returns the results in job order. `progress(done, total)` is called from
+        the workers as jobs finish. The first exception raised by `fn` or
+        `progress` is re-raised once every job has run.
+        """
+        if not jobs:
+            return []
+        keyed: list[tuple[int, int, int]] = []
+        for i, (path, _) in enumerate(jobs):
+            try:
+                st = os.stat(path)
+                keyed.append((st.st_dev, -st.st_size, i))
+            except OSError:
+                keyed.append((-1, 0, i))
+        keyed.sort()
+        batch: _Batch[T, R] = _Batch(fn, [item for _, item in jobs], progress)
+        for dev, _, i in keyed:
+            batch.queues.setdefault(dev, deque()).append(i)
+        # Each lane drains one device's queue; the device's semaphore keeps the
+        # reads in flight on it to `per_device` even with other batches running.
+        pool = self._executor()
+        for dev, q in batch.queues.items():
+            sem = self._device(dev)
+            for _ in range(min(self.per_device, len(q))):
+                _ = pool.submit(self._lane, batch, q, sem)
+        _ = batch.finished.wait()
+        if batch.error is not None:
+            raise batch.error
+        return batch.results
+
+    def _count(self, batch: '_Batch[T, R]', i: int, r: R | None) -> int:
+        with self._lock:
+            batch.results[i] = r
+            batch.done += 1
+            return batch.done
+
+    def _lane(self, batch: '_Batch[T, R]', q: 'deque[int]', sem: threading.Semaphore) -> None:
+        total = len(batch.items)
+        while True:
+            with self._lock:
+                if not q:
+                    return
+                i = q.popleft()
+            done = 0
+            counted = False
+            try:
+                with sem:
+                    r = batch.fn(batch.items[i])
+                done = self._count(batch, i, r)
+                counted = True
+                if batch.progress is not None:
+                    batch.progress(done, total)
+            except BaseException as e:
+                with self._lock:
+                    if batch.error is None:
+                        batch.error = e
+                if not counted:
+                    done = self._count(batch, i, None)
+                # This lane ends with the error; a fresh one takes over the rest of the queue.
+                _ = self._executor().submit(self._lane, batch, q, sem)
+                raise
+            finally:
+                if done == total:
+                    batch.finished.set()
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False)
+                self._pool = None
@@ -0,0 +1,76 @@
+from collections.abc import Iterable, Iterator
+from time import time
+
+from plugin_oracle.base.journal import Journal
+from plugin_oracle.util.varint import Reader, varint
+
+
+class History:
+    """
+    Append-only record of every observed load order and its result.
+
+    Hashes are interned: the first time one shows up an `H` record assigns it
+    the next id. Each run is then an `O` record holding the result, a unix
+    timestamp and the varint ids of the order. A 1,500 mod run costs about
+    3 KB once its mods are known.
+    """
+    _fname: str = '/history.log'
+    _hsz: int = 32
+
+    def __init__(self, path: str) -> None:
+        self._log: Journal = Journal(path, History._fname)
+        self._ids: dict[bytes, int] = {}
+        self._hashes: list[bytes] = []
+        self.runs: int = 0
+        for kind, payload in self._log.replay():
+            if kind == b'H':
+                self._intern(payload)
+            elif kind == b'O':
+                self.runs += 1
+
+    def __len__(self) -> int:
+        return self.runs
+
+    def _intern(self, payload: bytes) -> None:
+        hsz = History._hsz
+        for i in range(0, len(payload), hsz):
+            h = payload[i:i + hsz]
+            self._ids[h] = len(self._hashes)
+            self._hashes.append(h)
+
+    def _encode(self, result: bool, order: list[bytes], records: list[tuple[bytes, bytes]]) -> None:
+        new = [h for h in dict.fromkeys(order) if h not in self._ids]
+        if new:
+            payload = b''.join(new)
+            self._intern(payload)
+            records.append((b'H', payload))
+        buf = bytearray([result])
+        varint(buf, int(time()))
+        varint(buf, len(order))
+        for h in order:
+            varint(buf, self._ids[h])
+        records.append((b'O', bytes(buf)))
+        self.runs += 1
+
+    def record(self, result: bool, order: list[bytes]) -> None:
+        self.record_many([(result, order)])
+
+    def record_many(self, runs: Iterable[tuple[bool, list[bytes]]]) -> None:
+        """Append several runs with a single write and sync."""
+        records: list[tuple[bytes, bytes]] = []
+        for result, order in runs:
+            self._encode(result, order, records)
+        self._log.append(records)
+
+    def __iter__(self) -> Iterator[tuple[bool, list[bytes]]]:
+        """Yield (result, load order) for every run, oldest first."""
+        hashes: list[bytes] = []
+        hsz = History._hsz
+        for kind, payload in self._log.replay():
+            if kind == b'H':
+                hashes.extend(payload[i:i + hsz] for i in range(0, len(payload), hsz))
+            elif kind == b'O':
+                rd = Reader(payload)
+                result = rd.take(1)[0] != 0
+                _ = rd.varint()
+                yield result, [hashes[rd.varint()] for _ in range(rd.varint())]
@@ -0,0 +1,114 @@
+import os
+import threading
+from collections.abc import Iterable
+from dataclasses import dataclass
+
+from plugin_oracle.base.journal import Journal
+from plugin_oracle.util.varint import Reader, varint
+
+
+@dataclass
+class Entry:
+    """Hash of a mod folder and the installation file it was computed from."""
+    hash: bytes
+    file: str
+    size: int
+    mtime: int
+
+    def fresh(self, path: str) -> bool:
+        """Whether `path` is still the file this entry was computed from, as far as can be told."""
+        if path != self.file:
+            return False
+        try:
+            st = os.stat(path)
+        except OSError:
+            # Downloads get cleaned up; without the archive the recorded hash is all there is.
+            return True
+        return st.st_size == self.size and st.st_mtime_ns == self.mtime
+
+class HashIndex:
+    """
+    Mod folder -> hash index kept in the plugin data path.
+
+    Stored as a journal of `S` (set) and `D` (drop) records, so it is read in
+    one go and every batch of updates lands with a single synced append. Once
+    superseded records make up most of the file it is rewritten. Updates are
+    serialised by the index itself, whichever thread they come from.
+    """
+    _fname: str = '/hashes.idx'
+    _hsz: int = 32
+
+    def __init__(self, path: str) -> None:
+        self._log: Journal = Journal(path, HashIndex._fname)
+        self._lock: threading.Lock = threading.Lock()
+        self._records: int = 0
+        self.entries: dict[str, Entry] = {}
+        for kind, payload in self._log.replay():
+            self._records += 1
+            if kind == b'S':
+                folder, e = HashIndex._decode(payload)
+                self.entries[folder] = e
+            elif kind == b'D':
+                _ = self.entries.pop(payload.decode('utf-8'), None)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, folder: str) -> Entry | None:
+        return self.entries.get(folder, None)
+
+    @staticmethod
+    def _encode(folder: str, e: Entry) -> bytes:
+        buf = bytearray(e.hash)
+        varint(buf, e.size)
+        varint(buf, max(e.mtime, 0))
+        for s in (folder, e.file):
+            b = s.encode('utf-8')
+            varint(buf, len(b))
+            buf += b
+        return bytes(buf)
+
+    @staticmethod
+    def _decode(payload: bytes) -> tuple[str, Entry]:
+        rd = Reader(payload)
+        hash = rd.take(HashIndex._hsz)
+        size = rd.varint()
+        mtime = rd.varint()
+        folder = rd.take(rd.varint()).decode('utf-8')
+        file = rd.take(rd.varint()).decode('utf-8')
+        return folder, Entry(hash, file, size, mtime)
+
+    def update(self, entries: Iterable[tuple[str, Entry]] = (), drop: Iterable[str] = ()) -> None:
+        """Apply a batch of sets and drops as one transaction."""
+        with self._lock:
+            records: list[tuple[bytes, bytes]] = []
+            for folder, e in entries:
+                self.entries[folder] = e
+                records.append((b'S', HashIndex._encode(folder, e)))
+            for folder in drop:
+                if self.entries.pop(folder, None) is not None:
+                    records.append((b'D', folder.encode('utf-8')))
+            if not records:
+                return
+            self._log.append(records)
+            self._records += len(records)
+            if self._records > 2 * len(self.entries) + 64:
+                self._compact()
+
+    def items(self) -> list[tuple[str, Entry]]:
+        """Snapshot of the entries, safe to walk while others update the index."""
+        with self._lock:
+            return list(self.entries.items())
+
+    def compact(self) -> None:
+        """Rewrite the index with one record per folder."""
+        with self._lock:
+            self._compact()
+
+    def _compact(self) -> None:
+        tmp = Journal(self._log.root, HashIndex._fname + '.tmp')
+        tmp.reset()
+        tmp.append((b'S', HashIndex._encode(folder, e)) for folder, e in self.entries.items())
+        os.replace(tmp.path, self._log.path)
+        self._log = Journal(self._log.root, HashIndex._fname)
+        self._records = len(self.entries)
@@ -0,0 +1,66 @@
+import os
+import struct
+import zlib
+from collections.abc import Iterable, Iterator
+
+
+class Journal:
+    """
+    Append-only log of database mutations kept beside a checkpoint.
+
+    Each record is framed as kind (1 byte), payload length (u32), payload and
+    a crc32 over all of the above. A torn or corrupt tail left behind by a crash
+    is detected on replay and cut off.
+    """
+    _fname: str = '/db.journal'
+    _head: struct.Struct = struct.Struct('<cI')
+    _crc: struct.Struct = struct.Struct('<I')
+
+    def __init__(self, path: str, fname: str = _fname) -> None:
+        self.root: str = path
+        self.path: str = path + fname
+        self.size: int = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+
+    def append(self, records: Iterable[tuple[bytes, bytes]]) -> None:
+        buf = bytearray()
+        for kind, payload in records:
+            head = Journal._head.pack(kind, len(payload))
+            buf += head
+            buf += payload
+            buf += Journal._crc.pack(zlib.crc32(payload, zlib.crc32(head)))
+        if not buf:
+            return
+        with open(self.path, 'ab') as f:
+            _ = f.write(buf)
+            f.flush()
+            os.fsync(f.fileno())
+        self.size += len(buf)
+
+    def replay(self, repair: bool = True) -> Iterator[tuple[bytes, bytes]]:
+        """Yield the intact records; the corrupt tail is cut off the file only with `repair`."""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'rb') as f:
+            dat = f.read()
+        hsz = Journal._head.size
+        csz = Journal._crc.size
+        off = 0
+        while off + hsz <= len(dat):
+            kind, n = Journal._head.unpack_from(dat, off)
+            end = off + hsz + n
+            if end + csz > len(dat):
+                break
+            crc, = Journal._crc.unpack_from(dat, end)
+            if crc != zlib.crc32(dat[off + hsz:end], zlib.crc32(dat[off:off + hsz])):
+                break
+            yield kind, dat[off + hsz:end]
+            off = end + csz
+        if repair and off != len(dat):
+            with open(self.path, 'r+b') as f:
+                _ = f.truncate(off)
+        self.size = off
+
+    def reset(self) -> None:
+        with open(self.path, 'wb') as f:
+            os.fsync(f.fileno())
+        self.size = 0
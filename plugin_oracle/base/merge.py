@@ -0,0 +1,55 @@
+"""
+Fold several Oracle databases into one.
+
+    python -m plugin_oracle.base.merge OUT IN [IN ...]
+
+Each IN may be a plugin data directory, a db.bin/db.pkl file or a relay
+export. Inputs are opened one at a time and released after they have been
+intersected in, so memory stays bounded by the output plus a single input.
+OUT is written as a relay export if it ends in `.orx`, otherwise as a data
+directory checkpoint.
+"""
+import sys
+from collections.abc import Callable, Iterable, Mapping
+
+from plugin_oracle.base.db import MDB
+from plugin_oracle.base.verify import Contradiction, Verifier
+
+
+def fold(paths: Iterable[str], db: MDB | None = None, verifier: Verifier | None = None, report: list[Contradiction] | None = None, record: Callable[[Mapping[bool, list[tuple[int, int]]]], None] | None = None) -> MDB:
+    """
+    Intersect every database in `paths` into `db` (or a fresh one).
+
+    With a verifier, rows a database is caught contradicting local evidence on
+    are left out of its merge and the contradictions are appended to `report`.
+    `record` is handed the edges each merge removed, e.g. to pass them on to peers.
+    """
+    out = MDB() if db is None else db
+    for path in paths:
+        src = MDB()
+        src.read(path)
+        bad: list[Contradiction] = []
+        if verifier is not None:
+            bad = verifier.check(src, path)
+            if report is not None:
+                report.extend(bad)
+        removed = out.merge(src, Verifier.offenders(bad))
+        if record is not None:
+            record(removed)
+        src.close()
+    return out
+
+def main(argv: list[str]) -> int:
+    if len(argv) < 2:
+        print(__doc__)
+        return 1
+    out = fold(argv[1:])
+    if argv[0].endswith('.orx'):
+        out.export(argv[0])
+    else:
+        out.checkpoint(argv[0])
+    print(f'Merged {len(argv) - 1} databases into {argv[0]} ({len(out)} mods)')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -1,81 +1,382 @@
-from random import shuffle
+from random import Random, shuffle
 from mobase import IModList, IOrganizer, IModInterface, IPluginList # pyright: ignore [reportMissingModuleSource]
-from plugin_oracle.util.mod.mo2 import modhash, esshash, allMods, setHash, getHash, isActive, isEssential
-from plugin_oracle.util.ml.graph import random_toposort
+from plugin_oracle.util.mod.mo2 import modhash, esshash, allMods, installPath, getHash, clearHash, isActive, isEssential
+from plugin_oracle.util.mod.profile import profile_files, read_modlist
+from plugin_oracle.util.ml.graph import Quotient, count_extensions, linear_extensions
 from plugin_oracle.base.db import MDB
+from plugin_oracle.base.history import History
+from plugin_oracle.base.digest import DigestCache
+from plugin_oracle.base.hasher import Hasher
+from plugin_oracle.base.index import Entry, HashIndex
+from plugin_oracle.base.journal import Journal
+from plugin_oracle.base.merge import fold
+from plugin_oracle.base.rebuild import rebuild
+from plugin_oracle.base.peer.node import Node
+from plugin_oracle.base.verify import Contradiction, Verifier
 from plugin_oracle.util.log import PluginLogger, getLogger
 from plugin_oracle.base.sync import pluginsync
-from concurrent.futures import ThreadPoolExecutor
+from collections.abc import Callable, Container, Iterable
+import math
+import threading
 from time import time
 import os
-from plugin_oracle.base.oracle.chresmolyte import Chresmolyte
+from plugin_oracle.base.oracle.predict import Prediction, Predictor
 from hashlib import sha256
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from plugin_oracle.base.oracle.chresmolyte import Chresmolyte
+
+def _mtime(mod: IModInterface) -> int:
+    try:
+        return os.stat(mod.absolutePath()).st_mtime_ns
+    except OSError:
+        return -1
+
+def _entry(hash: bytes, path: str) -> Entry:
+    try:
+        st = os.stat(path)
+        return Entry(hash, path, st.st_size, st.st_mtime_ns)
+    except OSError:
+        return Entry(hash, path, 0, 0)
 
 class Oracle:
+    _flagname: str = '/flagged.log'
+
     def __init__(self, path: str = '') -> None:
         self._log: PluginLogger = PluginLogger(getLogger(__name__), {'name': 'Oracle'})
         self.path: str = path
         if not os.path.exists(self.path):
             os.makedirs(self.path, exist_ok=True)
         self.db: MDB = MDB()
-        self.chresm: Chresmolyte = Chresmolyte()
+        self.node: Node | None = None
+        self.verifier: Verifier = Verifier(self.db)
+        self.history: History | None = None
+        self.predictor: Predictor = Predictor(self.db)
+        self.index: HashIndex = HashIndex(self.path)
+        self.digests: DigestCache = DigestCache(self.path)
+        self.hasher: Hasher = Hasher()
+        self._lock: threading.Lock = threading.Lock()
+        # Mod name -> (folder mtime, hash or None if it could not be resolved).
+        self._resolved: dict[str, tuple[int, bytes | None]] = {}
+        self._dirty: set[str] = set()
+        # Mods some resolve is hashing right now; others wait for it instead of reading them again.
+        self._inflight: dict[str, threading.Event] = {}
+        # Mods whose files changed in place, by name; kept out of observations until dealt with.
+        self.flagged: set[str] = set()
+        self._flags: Journal = Journal(self.path, Oracle._flagname)
+        for kind, payload in self._flags.replay():
+            if kind == b'F':
+                self.flagged.add(payload.decode('utf-8'))
+            elif kind == b'U':
+                self.flagged.discard(payload.decode('utf-8'))
+        self._rng: Random = Random()
+        self._quotient: tuple[int, list[bytes], Quotient] | None = None
+        # Set once load() has succeeded; `settled` once it has run either way.
+        self.loaded: threading.Event = threading.Event()
+        self.settled: threading.Event = threading.Event()
+        self._chresm: Chresmolyte | None = None
+
+    @property
+    def chresm(self) -> 'Chresmolyte':
+        # The automation stack is only pulled in when something actually uses it.
+        if self._chresm is None:
+            from plugin_oracle.base.oracle.chresmolyte import Chresmolyte
+            self._chresm = Chresmolyte()
+        return self._chresm
+
+    def quotient(self, order: list[bytes]) -> Quotient:
+        """
+        Order the database asserts among the mods of `order`, mods caught in a cycle merged into classes.
+
+        Built from `MDB.strict`, so the viewer, predictions and sampling all see
+        the same classes. Cached for `order`; when only follow set removals
+        happened since, just the rows they touch are redone and the classes
+        are updated in place.
+        """
+        db = self.db
+        cached = self._quotient
+        if cached is not None and cached[1] == order:
+            version, _, q = cached
+            if version == db.version:
+                return q
+            removed = db.removed_since(version)
+            if removed is not None:
+                t0 = time()
+                q.update(db.strict_changes(q.rows, q.of, removed))
+                self._quotient = (db.version, cached[1], q)
+                t1 = time()
+                self._log.debug(f'Updated the quotient with {len(removed)} removals in {t1 - t0}s')
+                return q
+        _ = db.register_many(order)
+        slots = db.slots(order)
+        q = Quotient(db.strict(slots), slots)
+        self._quotient = (db.version, list(order), q)
+        return q
 
     def save(self) -> None:
+        # A database that failed to load is partial; writing it would replace the one on disk.
+        if not self.loaded.is_set():
+            self._log.error('Not saving: the database did not load')
+            return
         self.db.save(self.path)
     
     def load(self) -> None:
-        self.db.load(self.path)
-
-    def addMod(self, mod: IModInterface, organizer: IOrganizer) -> bytes | None:
+        t0 = time()
         try:
-            hash = modhash(mod, organizer)
-            setHash(mod, hash)
-            return hash
-        except:
-            self._log.warning(f'Failed to find an installation file for {mod.name()}! Plugin will ignore this mod')
-            return None
-    
-    def _resolve(self, mlist: IModList, organizer: IOrganizer, verbose: bool = False) -> list[tuple[bytes, IModInterface]]:
+            self.db.load(self.path)
+            self.node = Node(self.db, self.path, self.verifier)
+            self.history = History(self.path)
+            # Decoding every past run is left until peer data actually has to be checked.
+            self.verifier.defer(self.history, len(self.history))
+            self.loaded.set()
+        finally:
+            self.settled.set()
+        t1 = time()
+        self._log.info(f'Loaded {len(self.db)} mods and {len(self.history)} runs in {t1 - t0}s')
+
+    def rebuild(self) -> None:
+        """Relearn every follow set from the recorded history alone."""
+        if self.history is None:
+            return
+        t0 = time()
+        rebuild(self.db, self.history)
+        t1 = time()
+        self._log.info(f'Rebuilt database from {len(self.history)} runs in {t1 - t0}s')
+
+    def merge(self, paths: list[str]) -> list[Contradiction]:
+        """Fold peer databases into ours, refusing rows that contradict our working orders."""
+        if not self.loaded.is_set():
+            self._log.error('Not merging: the database did not load')
+            return []
+        t0 = time()
+        report: list[Contradiction] = []
+        _ = fold(paths, self.db, self.verifier, report, None if self.node is None else self.node.record)
+        self._contradicted(report)
+        t1 = time()
+        self._log.info(f'Merged {len(paths)} databases in {t1 - t0}s')
+        return report
+
+    def _contradicted(self, report: list[Contradiction]) -> None:
+        for peer in sorted({c.peer for c in report}):
+            mods = sorted({self.db.mod_req(c.mod).name for c in report if c.peer == peer})
+            self._log.warning(f'{peer} contradicts local load orders on {len(mods)} mods: {", ".join(mods[:10])}')
+
+    def absorb(self) -> int:
+        """Apply what peers have sent since the last call; belongs on the thread that owns the database."""
+        if self.node is None:
+            return 0
+        t0 = time()
+        report: list[Contradiction] = []
+        count = self.node.drain(report)
+        self._contradicted(report)
+        t1 = time()
+        if count:
+            self._log.info(f'Applied {count} follow set edges from peers in {t1 - t0}s')
+        return count
+
+    def removeMod(self, name: str, organizer: IOrganizer) -> None:
+        self.invalidate([name])
+        self.unflag([name])
+        self.index.update(drop=[organizer.modsPath() + '/' + name])
+
+    def invalidate(self, names: Iterable[str] | None = None, force: bool = False) -> None:
+        """
+        Have the next resolve recheck these mods, or every cached one, against their folder mtime.
+
+        With `force` they are looked up again regardless; the index still spares
+        the rehash when their archive is unchanged.
+        """
+        if force:
+            for name in list(self._resolved) if names is None else names:
+                _ = self._resolved.pop(name, None)
+        else:
+            self._dirty.update(self._resolved if names is None else names)
+
+    def flag(self, names: Iterable[str]) -> None:
+        """Mark mods whose files changed in place; observations leave them out until `unflag` or `renew`."""
+        new = [n for n in dict.fromkeys(names) if n not in self.flagged]
+        self.flagged.update(new)
+        self._flags.append((b'F', n.encode('utf-8')) for n in new)
+
+    def unflag(self, names: Iterable[str]) -> None:
+        """Accept the changes to flagged mods: they are observed under their old identity again."""
+        gone = [n for n in dict.fromkeys(names) if n in self.flagged]
+        self.flagged.difference_update(gone)
+        if not self.flagged:
+            self._flags.reset()
+        else:
+            self._flags.append((b'U', n.encode('utf-8')) for n in gone)
+
+    def renew(self, names: Iterable[str], mlist: IModList) -> list[str]:
+        """
+        Give flagged mods a new identity, starting over on what is known about them.
+
+        The new hash is derived from the old one and stored in the index in its
+        place, so it lasts until the installation archive itself changes. What
+        was learned stays with the old hash, which still describes the
+        unchanged files peers may have. Returns the mods that had no index
+        entry to renew and stay flagged.
+        """
+        found: list[tuple[str, Entry]] = []
+        done: list[str] = []
+        missing: list[str] = []
+        for name in dict.fromkeys(names):
+            mod = mlist.getMod(name)
+            e = self.index.get(mod.absolutePath()) if mod is not None and name in self.flagged else None
+            if mod is None or e is None:
+                missing.append(name)
+                continue
+            found.append((mod.absolutePath(), Entry(sha256(b'changed' + e.hash).digest(), e.file, e.size, e.mtime)))
+            done.append(name)
+        self.index.update(found)
+        self.invalidate(done, force=True)
+        self.unflag(done)
+        return missing
+
+    def stale(self) -> list[str]:
+        """Folder names of indexed mods whose installation archive changed since it was hashed."""
+        return [os.path.basename(folder) for folder, e in self.index.items() if not e.fresh(e.file)]
+
+    def _resolve(self, mlist: IModList, organizer: IOrganizer, verbose: bool = False, only: Container[str] | None = None, progress: Callable[[int, int], None] | None = None) -> list[tuple[bytes, IModInterface]]:
+        """
+        Hashes of the mods in the list, computing those not cached yet.
+
+        With `only`, mods missing from the cache are hashed just when named in it
+        and left out otherwise. A mod another call is already hashing is waited
+        for rather than read twice. Safe to run off the UI thread; the database
+        is not touched.
+        """
+        found: list[tuple[str, Entry]] = []
+        markers: list[IModInterface] = []
+
+        def compute(mod: IModInterface) -> bytes:
+            if not isEssential(mod, mlist):
+                e = self.index.get(mod.absolutePath())
+                try:
+                    path = installPath(mod, organizer)
+                except OSError:
+                    path = e.file if e is not None else ''
+                if e is not None and e.fresh(path):
+                    return e.hash
+                hash = getHash(mod) if e is None else None
+                if hash is not None:
+                    markers.append(mod)
+                else:
+                    hash = modhash(mod, organizer, self.digests.digest)
+                found.append((mod.absolutePath(), _entry(hash, path)))
+                return hash
+
+            if not mod.absolutePath().endswith('/data'):
+                raise Exception('a')
+
+            return esshash(mod)
+
         def chash(mod: IModInterface) -> tuple[bytes, IModInterface] | None:
+            # Taken before hashing, so a change made while the mod is read is caught next time.
+            mtime = _mtime(mod)
             try:
-                if not isEssential(mod, mlist):
-                    hash = getHash(mod)                
-                    if hash is None:
-                        hash = modhash(mod, organizer)
-                        setHash(mod, hash)
-                    return (hash, mod)
-                
-                if not mod.absolutePath().endswith('/data'):
-                    raise Exception('a')
-
-                return (esshash(mod), mod)
+                hash = compute(mod)
             except:
+                hash = None
                 if verbose:
                     self._log.warning(f'Failed to find an installation file for {mod.name()}! Plugin will ignore this mod')
-                return None
+            self._resolved[mod.name()] = (mtime, hash)
+            self._release(mod.name(), mine[mod.name()])
+            return None if hash is None else (hash, mod)
 
-        mods = allMods(mlist)
-        if len(mods) > 32:
-            with ThreadPoolExecutor() as exec:
-                hashes = exec.map(chash, mods)
-        else:
-            hashes = map(chash, mods)
-        return [hash for hash in hashes if hash is not None]
+        def archive(mod: IModInterface) -> str:
+            try:
+                return mod.absolutePath() if isEssential(mod, mlist) else installPath(mod, organizer)
+            except OSError:
+                return ''
+
+        def report(done: int, total: int) -> None:
+            if total >= 32 and (done * 10 // total) != ((done - 1) * 10 // total):
+                self._log.info(f'Hashed {done}/{total} mods')
+            if progress is not None:
+                progress(done, total)
+
+        hashes: list[tuple[bytes, IModInterface] | None] = []
+        todo: list[tuple[str, IModInterface]] = []
+        elsewhere: list[tuple[threading.Event, IModInterface]] = []
+        mine: dict[str, threading.Event] = {}
+        for mod in allMods(mlist):
+            name = mod.name()
+            hit = self._resolved.get(name, None)
+            if name in self._dirty:
+                self._dirty.discard(name)
+                if hit is not None and hit[0] != _mtime(mod):
+                    _ = self._resolved.pop(name, None)
+                    hit = None
+            if hit is None:
+                if only is None or name in only:
+                    with self._lock:
+                        busy = self._inflight.get(name, None)
+                        if busy is None:
+                            mine[name] = self._inflight[name] = threading.Event()
+                    if busy is None:
+                        todo.append((archive(mod), mod))
+                    else:
+                        elsewhere.append((busy, mod))
+            elif hit[1] is not None:
+                hashes.append((hit[1], mod))
+        try:
+            if todo:
+                hashes.extend(self.hasher.map(chash, todo, report))
+        finally:
+            for name, done in mine.items():
+                self._release(name, done)
+        for busy, mod in elsewhere:
+            _ = busy.wait()
+            hit = self._resolved.get(mod.name(), None)
+            if hit is not None and hit[1] is not None:
+                hashes.append((hit[1], mod))
+        out = [hash for hash in hashes if hash is not None]
+        with self._lock:
+            if found:
+                self.index.update(found)
+            # Marker files from older versions go only once the index holds their hashes.
+            for mod in markers:
+                try:
+                    clearHash(mod)
+                except OSError:
+                    pass
+                # Deleting the marker bumps the folder mtime without changing the mod.
+                hit = self._resolved.get(mod.name(), None)
+                if hit is not None:
+                    self._resolved[mod.name()] = (_mtime(mod), hit[1])
+            if markers:
+                self._log.info(f'Moved {len(markers)} hash marker files into the index')
+            hits, matches, misses = self.digests.stats()
+            if hits or matches or misses:
+                self._log.info(f'Archive digests: {hits} cached, {matches} matched by fingerprint, {misses} hashed in full')
+        return out
+
+    def _release(self, name: str, done: threading.Event) -> None:
+        with self._lock:
+            if self._inflight.get(name, None) is done:
+                del self._inflight[name]
+        done.set()
 
     def resolve(self, mlist: IModList, organizer: IOrganizer, verbose: bool = True) -> None:
         t0 = time()
-        vers = sha256(organizer.managedGame().gameVersion().encode('ascii')).digest()
-        gm = self.db.mod_req(vers)
-        gm.name = f'{organizer.managedGame().gameName()} : {organizer.managedGame().gameVersion()}'
-        mods = self._resolve(mlist, organizer, verbose)
-        for mod in mods:
-            m = self.db.mod_req(mod[0])
-            m.name = mod[1].name()
+        self.register(self._resolve(mlist, organizer, verbose), organizer)
         t1 = time()
         self._log.info(f'Resolved mods in {t1 - t0}s')
-    
-    def permutation(self, mlist: IModList, organizer: IOrganizer) -> list[bytes]:
-        mods = self._resolve(mlist, organizer)
+
+    def register(self, mods: list[tuple[bytes, IModInterface]], organizer: IOrganizer) -> None:
+        """Enter resolved mods and the game version into the database under their current names."""
+        vers = sha256(organizer.managedGame().gameVersion().encode('ascii')).digest()
+        _ = self.db.register_many([vers] + [mod[0] for mod in mods])
+        self.db.rename(vers, f'{organizer.managedGame().gameName()} : {organizer.managedGame().gameVersion()}')
+        for mod in mods:
+            self.db.rename(mod[0], mod[1].name())
+
+    def permutation(self, mlist: IModList, organizer: IOrganizer, only: Container[str] | None = None) -> list[bytes]:
+        """Game version and active mods by priority; only active mods are resolved, and with `only` just those named."""
+        wanted = {mod.name() for mod in allMods(mlist) if isActive(mod, mlist) or isEssential(mod, mlist)}
+        mods = self._resolve(mlist, organizer, only=wanted if only is None else {n for n in wanted if n in only})
         active = list(filter(lambda mod: isActive(mod[1], mlist) or isEssential(mod[1], mlist), mods))
         active.sort(key=lambda mod: mlist.priority(mod[1].name()))
         vers = sha256(organizer.managedGame().gameVersion().encode('ascii')).digest()
@@ -84,22 +385,83 @@ class Oracle:
     def observe(self, result: bool, mlist: IModList, organizer: IOrganizer) -> None:
         t0 = time()
         loadorder = self.permutation(mlist, organizer)
-        for i in range(len(loadorder)):
-            fset = self.db.fset(loadorder[i], result)
-            if fset is None:
-                raise ValueError(f"Mod with hash {loadorder[i]} not found")
-            for j in range(i):
-                fset.discard(loadorder[j])
+        if self.flagged:
+            # The run says nothing reliable about mods whose files changed since the last one.
+            skip = {hit[1]: name for name in self.flagged if (hit := self._resolved.get(name, None)) is not None}
+            dropped = sorted(skip[h] for h in loadorder if h in skip)
+            if dropped:
+                self._log.warning(f'Leaving {len(dropped)} mods changed in place out of this observation: {", ".join(dropped[:10])}')
+                loadorder = [h for h in loadorder if h not in skip]
+        removed = self.db.observe(result, loadorder)
+        if self.node is not None:
+            self.node.record({result: removed})
+        if self.history is not None:
+            self.history.record(result, loadorder)
+        if result:
+            self.verifier.add(loadorder)
         t1 = time()
         self._log.info(f'Recorded run in {t1 - t0}s')
 
+    def importProfiles(self, roots: list[str], mlist: IModList, organizer: IOrganizer, batch: int = 256) -> int:
+        """
+        Learn from saved MO2 modlists as if every order in them had been run successfully.
+
+        Files are streamed one at a time and applied to the database in batches.
+        Mods that are not installed here are left out of the imported orders.
+        """
+        t0 = time()
+        vers = sha256(organizer.managedGame().gameVersion().encode('ascii')).digest()
+        known = {mod.name(): hash for hash, mod in self._resolve(mlist, organizer)}
+        seen: set[bytes] = set()
+        pending: list[tuple[bool, list[bytes]]] = []
+        files = 0
+
+        def flush() -> None:
+            if not pending:
+                return
+            removed = self.db.replay(pending)
+            if self.node is not None:
+                self.node.record(removed)
+            if self.history is not None:
+                self.history.record_many(pending)
+            self.verifier.add_many(order for _, order in pending)
+            pending.clear()
+
+        for path in profile_files(roots):
+            files += 1
+            try:
+                names = read_modlist(path)
+            except OSError as e:
+                self._log.warning(f'Failed to read {path}: {e}')
+                continue
+            order = [vers] + [known[n] for n in names if n in known]
+            key = sha256(b''.join(order)).digest()
+            if len(order) < 3 or key in seen:
+                continue
+            seen.add(key)
+            pending.append((True, order))
+            if len(pending) >= batch:
+                flush()
+        flush()
+        t1 = time()
+        self._log.info(f'Imported {len(seen)} distinct orders from {files} files in {t1 - t0}s')
+        return len(seen)
+
     def sample(self, mlist: IModList, plist: IPluginList, organizer: IOrganizer) -> None:
         t0 = time()
-        order = random_toposort(self.db.fsets)
-        if order is None:
+        perm = self.permutation(mlist, organizer)
+        # Mods caught in a cycle are ordered among themselves at random.
+        q = self.quotient(perm[1:])
+        classes = list(range(len(q)))
+        ext = next(linear_extensions(q.hasse, classes, rng=self._rng), None)
+        if ext is None:
             self._log.warning('Failed to find a topological sort!')
             return
-        order = [self.db.mod_req(h).name for h in order][1:]
+        free = sum(math.lgamma(len(m) + 1) for m in q.members) / math.log(2)
+        self._log.info(f'About 2^{count_extensions(q.hasse, classes, rng=self._rng) + free:.1f} load orders remain consistent with the database')
+        if not q.trivial():
+            self._log.info(f'{len(perm) - 1 - len(q)} mods share a class with others and are shuffled within it')
+        order = [self.db.mod_req(self.db.hash(s)).name for s in q.expand(ext, self._rng)]
         for i in range(len(order)):
             _ = mlist.setPriority(order[i], i)
         pluginsync(organizer, mlist, plist)
@@ -117,20 +479,10 @@ class Oracle:
         t1 = time()
         self._log.info(f'Derived and applied new order in {t1 - t0}s')
 
-    def predict(self, mlist: IModList, organizer: IOrganizer) -> str:
-        loadorder = self.permutation(mlist, organizer)
-        report: list[tuple[str, str]] = []
-        for i, hash in enumerate(loadorder):
-            fset = self.db.fset(hash)
-            for j in range(i + 1, len(loadorder)):
-                if fset is None or loadorder[j] not in fset:
-                    report.append((self.db.mod_req(hash).name, self.db.mod_req(loadorder[j]).name))
-        sreport = ''
-        for pair in report:
-            sreport += f'{pair[0]} -> {pair[1]}\n'
-        if len(report):
-            return f'Invalid orders:\n{sreport}'
-        return 'No invalid orders detected.'
-
-    
-
+    def predict(self, mlist: IModList, organizer: IOrganizer) -> Prediction:
+        t0 = time()
+        order = self.permutation(mlist, organizer)
+        result = self.predictor.predict(order, self.quotient(order))
+        t1 = time()
+        self._log.info(f'Found {result.total} violations, {len(result.minimal)} minimal, in {t1 - t0}s')
+        return result
@@ -0,0 +1,146 @@
+from dataclasses import dataclass, field
+
+from plugin_oracle.base.db import MDB
+from plugin_oracle.util.bits import bits, full, mask
+from plugin_oracle.util.ml.graph import Closure, Quotient
+
+
+@dataclass
+class Prediction:
+    """
+    Pairs of a load order that contradict the database.
+
+    A pair (i, j), i < j, is a violation when the mod at position j has been
+    seen before the mod at position i. `minimal` keeps only the violations no
+    chain of other violations implies; `total` counts all of them. `classes`
+    gives, per position, the class of mods the database cannot tell apart it
+    belongs to, if known.
+    """
+    order: list[bytes]
+    names: list[str]
+    total: int = 0
+    minimal: list[tuple[int, int]] = field(default_factory=list)
+    classes: list[int] = field(default_factory=list)
+
+    def __bool__(self) -> bool:
+        return self.total > 0
+
+    def pairs(self) -> list[tuple[bytes, bytes]]:
+        return [(self.order[i], self.order[j]) for i, j in self.minimal]
+
+    def groups(self) -> list[tuple[list[int], list[int]]]:
+        """Minimal violations merged by the classes at either end, as (earlier, later) positions."""
+        if not self.classes:
+            return [([i], [j]) for i, j in self.minimal]
+        out: dict[tuple[int, int], tuple[dict[int, None], dict[int, None]]] = {}
+        for i, j in self.minimal:
+            a, b = out.setdefault((self.classes[i], self.classes[j]), ({}, {}))
+            a[i] = None
+            b[j] = None
+        return [(list(a), list(b)) for a, b in out.values()]
+
+    def report(self, limit: int = 200) -> str:
+        if not self.total:
+            return 'No invalid orders detected.'
+        groups = self.groups()
+        lines = [
+            f"{' = '.join(self.names[i] for i in a)} -> {' = '.join(self.names[j] for j in b)}"
+            for a, b in groups[:limit]
+        ]
+        if len(groups) > limit:
+            lines.append(f'... and {len(groups) - limit} more')
+        head = f'Invalid orders ({len(self.minimal)} of {self.total} not implied by others):'
+        return '\n'.join([head, *lines])
+
+    def __str__(self) -> str:
+        return self.report()
+
+class Predictor:
+    """
+    Violation sets of the current load order, cached between calls.
+
+    Per mod the violators are kept as a bitset over slots, which only changes
+    when the mod's row changes or the set of mods placed after it does. A new
+    order only invalidates the span between its first and last moved position,
+    and a new database version only the rows that actually differ. Positions
+    are a topological order of the violations, which are kept in a `Closure`
+    so the reduction to minimal violations is only redone where it moved.
+    """
+
+    def __init__(self, db: MDB) -> None:
+        self.db: MDB = db
+        self._version: int = -1
+        self._order: list[bytes] = []
+        self._rows: list[int] = []
+        self._bad: list[int] = []
+        self._good: list[int] = []
+        # Position space: violators, everything they imply, and the reduction.
+        self._pbad: list[int] = []
+        self._closure: Closure = Closure()
+        self._last: Prediction | None = None
+
+    def _span(self, order: list[bytes]) -> tuple[int, int]:
+        """First and last position whose successors may differ from the cached order."""
+        old = self._order
+        n = len(order)
+        # Every cached tail below the span holds the same mods only if the order does.
+        if len(old) != n or set(old) != set(order):
+            return 0, n - 1
+        lo = 0
+        while lo < n and old[lo] == order[lo]:
+            lo += 1
+        hi = n - 1
+        while hi >= lo and old[hi] == order[hi]:
+            hi -= 1
+        return lo, hi
+
+    def predict(self, order: list[bytes], quotient: Quotient | None = None) -> Prediction:
+        """Violations of `order`, grouped by the classes of `quotient` if given."""
+        db = self.db
+        if self._last is not None and db.version == self._version and order == self._order:
+            if quotient is not None and not self._last.classes:
+                self._last.classes = [quotient.of[s] for s in db.slots(order)]
+            return self._last
+        _ = db.register_many(order)
+        n = len(order)
+        lo, hi = self._span(order)
+        if lo == 0 and hi == n - 1:
+            self._rows = [-1] * n
+            self._bad = [0] * n
+            self._good = [0] * n
+            self._pbad = [0] * n
+            self._closure = Closure(self._pbad)
+        rows = db.rows()
+        slots = db.slots(order)
+        stale = db.version != self._version
+        top = hi if lo <= hi else -1
+        acc = 0
+        for i in range(n - 1, -1, -1):
+            r = rows[slots[i]] if stale or lo <= i <= hi else self._rows[i]
+            if lo <= i <= hi or r != self._rows[i]:
+                self._rows[i] = r
+                self._bad[i] = acc & ~r
+                self._good[i] = acc & r
+                top = max(top, i)
+            acc |= 1 << slots[i]
+        pos = {s: i for i, s in enumerate(slots)}
+        total = 0
+        for i in range(n - 1, -1, -1):
+            if i <= top:
+                # Map whichever of the violators or the rest of the tail is sparser.
+                bad = self._bad[i]
+                good = self._good[i]
+                if good.bit_count() < bad.bit_count():
+                    x = (full(n) ^ full(i + 1)) & ~mask(pos[s] for s in bits(good))
+                else:
+                    x = mask(pos[s] for s in bits(bad))
+                self._pbad[i] = x
+            total += self._pbad[i].bit_count()
+        self._closure.update({i: self._pbad[i] for i in range(top + 1)})
+        self._order = list(order)
+        self._version = db.version
+        names = [db.mod_req(h).name for h in order]
+        minimal = list(self._closure.edges())
+        classes = [quotient.of[s] for s in slots] if quotient is not None else []
+        self._last = Prediction(list(order), names, total, minimal, classes)
+        return self._last
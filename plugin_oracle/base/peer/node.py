@@ -0,0 +1,214 @@
+import os
+import threading
+from collections.abc import Callable, Mapping
+
+from plugin_oracle.base.db import MDB
+from plugin_oracle.base.journal import Journal
+from plugin_oracle.base.peer.transport import Transport
+from plugin_oracle.base.peer.wire import (
+    OSZ,
+    Entry,
+    decode_delta,
+    decode_entry,
+    decode_header,
+    decode_vector,
+    encode_delta,
+    encode_entry,
+    encode_vector,
+)
+from plugin_oracle.base.verify import Contradiction, Verifier
+from plugin_oracle.util.varint import Reader
+
+
+class Node:
+    """
+    One instance's side of follow set synchronisation.
+
+    Every batch of edges this instance removes becomes an entry tagged with its
+    origin id and a per-origin sequence number. Entries received from peers
+    are applied and kept too, so they can be relayed. A version vector records
+    the highest contiguous sequence number held for each origin. A peer only
+    needs to be sent the entries above its vector.
+
+    Deltas from peers are only queued when they arrive, on whichever thread
+    that is; `drain` applies them and belongs on the thread that owns the
+    database, like every other change to it. With a verifier, each entry is
+    checked against local working orders first and the rows it is caught
+    contradicting them on are not applied; the entry is still kept and relayed
+    as it came, for every receiver checks it itself. Removing an edge twice changes
+    nothing, so once the log outgrows a bound each origin's entries are folded
+    into a single one covering its whole range, which a peer anywhere in that
+    range can still take.
+    """
+    _idname: str = '/peer.id'
+    _logname: str = '/peer.log'
+    _slack: int = 256
+
+    def __init__(self, db: MDB, path: str, verifier: Verifier | None = None) -> None:
+        self.db: MDB = db
+        self.verifier: Verifier | None = verifier
+        self._lock: threading.RLock = threading.RLock()
+        os.makedirs(path, exist_ok=True)
+        if os.path.exists(path + Node._idname):
+            with open(path + Node._idname, 'rb') as f:
+                self.origin: bytes = f.read()
+        else:
+            self.origin = os.urandom(OSZ)
+            with open(path + Node._idname, 'wb') as f:
+                _ = f.write(self.origin)
+        self.clock: dict[bytes, int] = {}
+        # Called, from the receiving thread, whenever a delta is queued.
+        self.received: Callable[[], None] | None = None
+        self._inbox: list[bytes] = []
+        self._entries: list[tuple[bytes, int, int, bytes]] = []
+        self._log: Journal = Journal(path, Node._logname)
+        for kind, payload in self._log.replay():
+            if kind == b'E':
+                self._index(payload)
+        if self._full():
+            self._compact()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _index(self, entry: bytes) -> None:
+        origin, first, seq = decode_header(entry)
+        self._entries.append((origin, first, seq, entry))
+        self.clock[origin] = seq
+
+    def _full(self) -> bool:
+        return len(self._entries) > 2 * len(self.clock) + Node._slack
+
+    def _write(self, entries: list[bytes]) -> None:
+        self._log.append((b'E', e) for e in entries)
+        if self._full():
+            self._compact()
+
+    def _compact(self) -> None:
+        """Fold every origin's entries into one and rewrite the log with them."""
+        db = self.db
+        folded: dict[bytes, tuple[int, int, dict[bool, dict[int, int]]]] = {}
+        for origin, first, seq, raw in self._entries:
+            lo, hi, rows = folded.get(origin, (first, seq, {False: {}, True: {}}))
+            e = decode_entry(Reader(raw))
+            for inv, edges in e.edges.items():
+                _ = db.register_many(h for src, dst in edges for h in (src, *dst))
+                acc = rows[inv]
+                for src, dst in edges:
+                    s = db.slot(src)
+                    assert s is not None
+                    acc[s] = acc.get(s, 0) | db.mask(dst)
+            folded[origin] = (min(lo, first), max(hi, seq), rows)
+        entries = [
+            encode_entry(Entry(origin, lo, hi, {inv: [(db.hash(s), db.hashes(x)) for s, x in acc.items()] for inv, acc in rows.items()}))
+            for origin, (lo, hi, rows) in folded.items()
+        ]
+        tmp = Journal(self._log.root, Node._logname + '.tmp')
+        tmp.reset()
+        tmp.append((b'E', e) for e in entries)
+        os.replace(tmp.path, self._log.path)
+        self._log = Journal(self._log.root, Node._logname)
+        self._entries = []
+        for e in entries:
+            self._index(e)
+
+    def record(self, removed: Mapping[bool, list[tuple[int, int]]]) -> None:
+        """Log edges this instance removed, as returned by the `MDB` methods, keyed by `inv`."""
+        edges = {inv: [(self.db.hash(s), self.db.hashes(x)) for s, x in r] for inv, r in removed.items() if r}
+        if not edges:
+            return
+        with self._lock:
+            seq = self.clock.get(self.origin, 0) + 1
+            entry = encode_entry(Entry(self.origin, seq, seq, edges))
+            self._index(entry)
+            self._write([entry])
+
+    def vector(self) -> bytes:
+        with self._lock:
+            return encode_vector(self.clock)
+
+    def delta(self, vec: dict[bytes, int]) -> bytes:
+        """Every entry the holder of `vec` has not seen yet."""
+        with self._lock:
+            return encode_delta(e for origin, _, seq, e in self._entries if seq > vec.get(origin, 0))
+
+    def receive(self, delta: bytes) -> None:
+        """Queue a peer's delta for `drain`; safe from any thread."""
+        with self._lock:
+            self._inbox.append(delta)
+        if self.received is not None:
+            self.received()
+
+    def _removed(self, origin: bytes) -> dict[bytes, set[bytes]]:
+        """Every mod `origin` has dropped from each positive follow set, by the entries held."""
+        out: dict[bytes, set[bytes]] = {}
+        for o, _, _, raw in self._entries:
+            if o == origin:
+                for src, dst in decode_entry(Reader(raw)).edges.get(True, []):
+                    out.setdefault(src, set()).update(dst)
+        return out
+
+    def drain(self, report: list[Contradiction] | None = None) -> int:
+        """
+        Apply the queued deltas, returning the number of edges they removed here.
+
+        Contradictions the verifier finds are appended to `report`.
+        """
+        count = 0
+        with self._lock:
+            inbox, self._inbox = self._inbox, []
+            taken: list[bytes] = []
+            removed: dict[bytes, dict[bytes, set[bytes]]] = {}
+            for delta in inbox:
+                for raw in decode_delta(delta):
+                    origin, first, seq = decode_header(raw)
+                    held = self.clock.get(origin, 0)
+                    # Only entries continuing what we hold are taken; anything past a gap is re-sent later.
+                    if first > held + 1 or seq <= held:
+                        continue
+                    e = decode_entry(Reader(raw))
+                    bad: set[bytes] = set()
+                    if self.verifier is not None:
+                        if origin not in removed:
+                            removed[origin] = self._removed(origin)
+                        acc = removed[origin]
+                        for src, dst in e.edges.get(True, []):
+                            acc.setdefault(src, set()).update(dst)
+                        found = self.verifier.check_removals(e.edges.get(True, []), acc, origin.hex())
+                        if report is not None:
+                            report.extend(found)
+                        bad = Verifier.offenders(found)
+                    for inv, edges in e.edges.items():
+                        edges = [(src, dst) for src, dst in edges if src not in bad]
+                        if edges:
+                            count += sum(x.bit_count() for _, x in self.db.remove(inv, edges))
+                    self._index(raw)
+                    taken.append(raw)
+            self._write(taken)
+        return count
+
+    def handle(self, request: bytes) -> bytes:
+        op, body = request[:1], request[1:]
+        if op == b'V':
+            return self.vector()
+        if op == b'G':
+            return self.delta(decode_vector(body))
+        if op == b'P':
+            self.receive(body)
+            return b''
+        raise ValueError(f'Unknown request {op!r}')
+
+    def sync(self, transport: Transport) -> int:
+        """
+        Push what the peer lacks and queue what we lack; returns the entries sent.
+
+        Safe off the database's thread: what is pulled only lands on `drain`.
+        """
+        remote = decode_vector(transport.request(b'V'))
+        with self._lock:
+            sent = sum(1 for origin, _, seq, _ in self._entries if seq > remote.get(origin, 0))
+            push = self.delta(remote)
+        if sent:
+            _ = transport.request(b'P' + push)
+        self.receive(transport.request(b'G' + self.vector()))
+        return sent
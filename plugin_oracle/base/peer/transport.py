@@ -0,0 +1,82 @@
+import socket
+import socketserver
+import struct
+import threading
+from abc import ABC, abstractmethod
+from typing import Protocol
+
+_len: struct.Struct = struct.Struct('<I')
+
+class Handler(Protocol):
+    def handle(self, request: bytes) -> bytes: ...
+
+class Transport(ABC):
+    """Request/response channel to a single peer."""
+
+    @abstractmethod
+    def request(self, data: bytes) -> bytes:
+        ...
+
+class LocalTransport(Transport):
+    """Calls straight into a peer living in the same process."""
+
+    def __init__(self, peer: Handler) -> None:
+        self.peer: Handler = peer
+
+    def request(self, data: bytes) -> bytes:
+        return self.peer.handle(data)
+
+def _recv(sock: socket.socket, n: int) -> bytes:
+    buf = bytearray()
+    while len(buf) < n:
+        chunk = sock.recv(n - len(buf))
+        if not chunk:
+            raise ConnectionError('Peer closed the connection')
+        buf += chunk
+    return bytes(buf)
+
+def _send(sock: socket.socket, data: bytes) -> None:
+    sock.sendall(_len.pack(len(data)) + data)
+
+def _read(sock: socket.socket) -> bytes:
+    n, = _len.unpack(_recv(sock, _len.size))
+    return _recv(sock, n)
+
+class TCPTransport(Transport):
+    """Length-prefixed frames over TCP, one connection per request."""
+
+    def __init__(self, host: str, port: int, timeout: float = 30.0) -> None:
+        self.host: str = host
+        self.port: int = port
+        self.timeout: float = timeout
+
+    def request(self, data: bytes) -> bytes:
+        with socket.create_connection((self.host, self.port), self.timeout) as sock:
+            _send(sock, data)
+            return _read(sock)
+
+class Server:
+    """Reference server exposing a peer on localhost, for testing and LAN use."""
+
+    def __init__(self, peer: Handler, host: str = '127.0.0.1', port: int = 0) -> None:
+        class _Handler(socketserver.BaseRequestHandler):
+            def handle(self) -> None:
+                sock: socket.socket = self.request # pyright: ignore [reportAny]
+                _send(sock, peer.handle(_read(sock)))
+
+        self._server: socketserver.ThreadingTCPServer = socketserver.ThreadingTCPServer((host, port), _Handler)
+        self._server.daemon_threads = True
+        self.host: str = host
+        self.port: int = self._server.server_address[1] # pyright: ignore [reportAny]
+        self._thread: threading.Thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    def start(self) -> 'Server':
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def transport(self) -> TCPTransport:
+        return TCPTransport(self.host, self.port)
@@ -0,0 +1,122 @@
+"""
+Binary encoding of follow set deltas.
+
+An entry is the edges removed by a single instance over a contiguous range
+of its sequence numbers, `first` to `seq`:
+
+    origin (16 bytes) | seq (varint) | seq - first (varint) | table | rows | rows
+
+`table` is a varint count followed by the 32-byte hashes the entry mentions.
+Two row lists follow, for the incomparability sets and then the follow sets,
+each a varint count of rows. A row is a varint source index into the table, a
+mode byte and the removed targets: either a varint count of delta-coded table
+indices or, when that would be larger, a bitmask over the table.
+"""
+import zlib
+from collections.abc import Iterable
+
+from plugin_oracle.util.bits import bits, mask
+from plugin_oracle.util.varint import Reader, varint
+
+HSZ: int = 32
+OSZ: int = 16
+
+Edges = list[tuple[bytes, list[bytes]]]
+
+class Entry:
+    def __init__(self, origin: bytes, first: int, seq: int, edges: dict[bool, Edges]) -> None:
+        self.origin: bytes = origin
+        self.first: int = first
+        self.seq: int = seq
+        # Removed (source, targets) edges of the follow sets (True) and incomparability sets (False).
+        self.edges: dict[bool, Edges] = edges
+
+    def __len__(self) -> int:
+        return sum(len(dst) for edges in self.edges.values() for _, dst in edges)
+
+def encode_entry(e: Entry) -> bytes:
+    rows = [e.edges.get(inv, []) for inv in (False, True)]
+    table = list(dict.fromkeys(h for edges in rows for src, dst in edges for h in (src, *dst)))
+    index = {h: i for i, h in enumerate(table)}
+    width = (len(table) + 7) >> 3
+    buf = bytearray(e.origin)
+    varint(buf, e.seq)
+    varint(buf, e.seq - e.first)
+    varint(buf, len(table))
+    buf += b''.join(table)
+    for edges in rows:
+        varint(buf, len(edges))
+        for src, dst in edges:
+            varint(buf, index[src])
+            idx = sorted(index[h] for h in dst)
+            lst = bytearray()
+            varint(lst, len(idx))
+            prev = 0
+            for i in idx:
+                varint(lst, i - prev)
+                prev = i
+            if len(lst) <= width:
+                buf.append(0)
+                buf += lst
+            else:
+                buf.append(1)
+                buf += mask(idx).to_bytes(width, 'little')
+    return bytes(buf)
+
+def decode_header(entry: bytes) -> tuple[bytes, int, int]:
+    """(origin, first, seq) of an encoded entry, without decoding the rest."""
+    rd = Reader(entry)
+    rd.off = OSZ
+    seq = rd.varint()
+    return entry[:OSZ], seq - rd.varint(), seq
+
+def decode_entry(rd: Reader) -> Entry:
+    origin = rd.take(OSZ)
+    seq = rd.varint()
+    first = seq - rd.varint()
+    n = rd.varint()
+    table = [rd.take(HSZ) for _ in range(n)]
+    width = (n + 7) >> 3
+    out: dict[bool, Edges] = {}
+    for inv in (False, True):
+        edges: Edges = []
+        for _ in range(rd.varint()):
+            src = table[rd.varint()]
+            if rd.take(1)[0] == 0:
+                dst: list[bytes] = []
+                i = 0
+                for _ in range(rd.varint()):
+                    i += rd.varint()
+                    dst.append(table[i])
+            else:
+                dst = [table[i] for i in bits(int.from_bytes(rd.take(width), 'little'))]
+            edges.append((src, dst))
+        out[inv] = edges
+    return Entry(origin, first, seq, out)
+
+def encode_delta(entries: Iterable[bytes]) -> bytes:
+    """Pack already encoded entries into one compressed message."""
+    buf = bytearray()
+    for e in entries:
+        varint(buf, len(e))
+        buf += e
+    return zlib.compress(bytes(buf))
+
+def decode_delta(data: bytes) -> list[bytes]:
+    rd = Reader(zlib.decompress(data))
+    out: list[bytes] = []
+    while not rd.done():
+        out.append(rd.take(rd.varint()))
+    return out
+
+def encode_vector(vec: dict[bytes, int]) -> bytes:
+    buf = bytearray()
+    varint(buf, len(vec))
+    for origin, seq in sorted(vec.items()):
+        buf += origin
+        varint(buf, seq)
+    return bytes(buf)
+
+def decode_vector(data: bytes) -> dict[bytes, int]:
+    rd = Reader(data)
+    return {rd.take(OSZ): rd.varint() for _ in range(rd.varint())}
@@ -0,0 +1,85 @@
+import threading
+
+from PyQt6.QtCore import QObject, pyqtSignal
+
+from plugin_oracle.base.oracle.oracle import Oracle
+from plugin_oracle.base.peer.transport import Server, TCPTransport
+from plugin_oracle.util.log import PluginLogger, getLogger
+
+
+def address(text: str) -> tuple[str, int]:
+    """Parse `host:port`."""
+    host, sep, port = text.strip().rpartition(':')
+    if not sep or not host:
+        raise ValueError(f'Expected host:port, got {text!r}')
+    return host, int(port)
+
+class Peers(QObject):
+    """
+    Keeps the oracle's follow sets in step with other instances.
+
+    The local node is optionally served on `listen`, and synced with each of
+    `peers` on a background thread. Deltas arriving either way are only queued
+    by the node; they are applied from the thread the bridge lives on, i.e. the
+    UI thread, through a queued connection.
+    """
+    _received = pyqtSignal()
+
+    def __init__(self, oracle: Oracle, listen: tuple[str, int] | None, peers: list[tuple[str, int]]) -> None:
+        super().__init__()
+        self._log: PluginLogger = PluginLogger(getLogger(__name__), {'name': 'Peers'})
+        self.oracle: Oracle = oracle
+        self._listen: tuple[str, int] | None = listen
+        self._peers: list[tuple[str, int]] = peers
+        self._server: Server | None = None
+        self._thread: threading.Thread | None = None
+        self._started: bool = False
+        self._guard: threading.Lock = threading.Lock()
+        _ = self._received.connect(self._absorb) # pyright: ignore [reportUnknownMemberType]
+
+    def start(self) -> None:
+        """Serve and sync once the database has loaded; later calls do nothing."""
+        node = self.oracle.node
+        if self._started or node is None:
+            return
+        self._started = True
+        node.received = self._received.emit
+        if self._listen is not None:
+            try:
+                self._server = Server(node, *self._listen).start()
+                self._log.info(f'Serving peers on {self._listen[0]}:{self._server.port}')
+            except OSError as e:
+                self._log.warning(f'Could not serve peers on {self._listen[0]}:{self._listen[1]}: {e}')
+        self.sync()
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.stop()
+            self._server = None
+
+    def sync(self) -> None:
+        """Exchange entries with every configured peer on a background thread."""
+        if not self._started or not self._peers:
+            return
+        with self._guard:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name='oracle-peers', daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        node = self.oracle.node
+        assert node is not None
+        try:
+            for host, port in self._peers:
+                try:
+                    sent = node.sync(TCPTransport(host, port))
+                    self._log.info(f'Sent {sent} entries to {host}:{port}')
+                except (OSError, ValueError) as e:
+                    self._log.warning(f'Sync with {host}:{port} failed: {e}')
+        finally:
+            with self._guard:
+                self._thread = None
+
+    def _absorb(self) -> None:
+        _ = self.oracle.absorb()
@@ -0,0 +1,45 @@
+"""
+Relearn an Oracle database from its recorded run history.
+
+    python -m plugin_oracle.base.rebuild DATA [OUT]
+
+DATA is a plugin data directory. Every run in its history.log is replayed in
+bulk into fresh follow sets for the mods the database knows, so whatever was
+merged in from peers is dropped. The result replaces the database in DATA,
+or is written to OUT: a relay export if it ends in `.orx`, otherwise a data
+directory checkpoint. Close MO2 before rebuilding its own data directory.
+"""
+import sys
+from collections.abc import Iterable
+from time import time
+
+from plugin_oracle.base.db import MDB
+from plugin_oracle.base.history import History
+
+def rebuild(db: MDB, runs: Iterable[tuple[bool, list[bytes]]]) -> None:
+    """Forget what `db` learned and replay `runs` into it in one pass."""
+    db.reset()
+    _ = db.replay(runs)
+
+def main(argv: list[str]) -> int:
+    if len(argv) not in (1, 2):
+        print(__doc__)
+        return 1
+    path = argv[0]
+    out = argv[1] if len(argv) == 2 else path
+    t0 = time()
+    db = MDB()
+    # In place, the journal stays attached so the checkpoint supersedes it.
+    db.load(path, readonly=out != path)
+    history = History(path)
+    rebuild(db, history)
+    if out.endswith('.orx'):
+        db.export(out)
+    elif out != path:
+        db.checkpoint(out)
+    t1 = time()
+    print(f'Rebuilt {len(db)} mods from {len(history)} runs into {out} in {t1 - t0:.1f}s')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
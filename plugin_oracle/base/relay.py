@@ -0,0 +1,135 @@
+"""
+Compact exchange format for follow set databases.
+
+A learned relation is stored as its condensation: the strongly connected
+components, the transitive reduction (Hasse diagram) between them, and the
+exceptions, i.e. the pairs the closure of that diagram implies but the
+relation itself does not contain. Expanding the diagram and dropping the
+exceptions gives back the rows exactly. This holds for follow sets and
+incomparability sets alike, whether or not they are transitive.
+
+The whole payload is zlib compressed.
+"""
+import struct
+import zlib
+from array import array
+from collections.abc import Sequence
+
+from plugin_oracle.util.bits import bits
+from plugin_oracle.util.ml.graph import Quotient
+
+_magic: bytes = b'ORFX'
+_version: int = 1
+_header: struct.Struct = struct.Struct('<4sHHI')
+_u8: struct.Struct = struct.Struct('<B')
+_u16: struct.Struct = struct.Struct('<H')
+_u32: struct.Struct = struct.Struct('<I')
+
+def _ints(buf: bytearray, vals: Sequence[int]) -> None:
+    buf += _u32.pack(len(vals))
+    buf += array('I', vals).tobytes()
+
+def _expand(v: int, c: int, masks: list[int], reach: list[int]) -> int:
+    return (masks[c] & ~(1 << v)) | reach[c]
+
+def _encode_rows(buf: bytearray, rows: Sequence[int], width: int) -> None:
+    q = Quotient(rows, list(range(len(rows))))
+    k = len(q)
+    # Stored sinks first, i.e. in reverse topological order.
+    buf += _u32.pack(k)
+    for m in reversed(q.masks):
+        _ints(buf, list(bits(m)))
+    for c in range(k - 1, -1, -1):
+        _ints(buf, [k - 1 - d for d in q.closure.successors(c)])
+    reach = q.closure.reach
+    exc: list[tuple[int, int]] = []
+    for v, r in enumerate(rows):
+        x = _expand(v, q.of[v], q.masks, reach) & ~r
+        if x:
+            exc.append((v, x))
+    buf += _u32.pack(len(exc))
+    for v, x in exc:
+        buf += _u32.pack(v)
+        if 4 * x.bit_count() < width:
+            buf += _u8.pack(0)
+            _ints(buf, list(bits(x)))
+        else:
+            buf += _u8.pack(1)
+            buf += x.to_bytes(width, 'little')
+
+class _Reader:
+    def __init__(self, data: bytes) -> None:
+        self.data: memoryview = memoryview(data)
+        self.off: int = 0
+
+    def take(self, n: int) -> bytes:
+        out = bytes(self.data[self.off:self.off + n])
+        self.off += n
+        return out
+
+    def unpack(self, s: struct.Struct) -> int:
+        v, = s.unpack_from(self.data, self.off)
+        self.off += s.size
+        return v # pyright: ignore [reportAny]
+
+    def ints(self) -> list[int]:
+        n = self.unpack(_u32)
+        a = array('I')
+        a.frombytes(self.take(4 * n))
+        return a.tolist()
+
+def _decode_rows(rd: _Reader, n: int, width: int) -> list[int]:
+    masks: list[int] = []
+    comp = [0] * n
+    for c in range(rd.unpack(_u32)):
+        m = 0
+        for v in rd.ints():
+            comp[v] = c
+            m |= 1 << v
+        masks.append(m)
+    # Components are stored sinks first, so every target is already expanded.
+    reach = [0] * len(masks)
+    for c in range(len(masks)):
+        acc = 0
+        for d in rd.ints():
+            acc |= masks[d] | reach[d]
+        reach[c] = acc
+    rows = [_expand(v, comp[v], masks, reach) for v in range(n)]
+    for _ in range(rd.unpack(_u32)):
+        v = rd.unpack(_u32)
+        if rd.unpack(_u8) == 0:
+            for w in rd.ints():
+                rows[v] &= ~(1 << w)
+        else:
+            rows[v] &= ~int.from_bytes(rd.take(width), 'little')
+    return rows
+
+def encode(hsz: int, hashes: list[bytes], names: list[str], frows: Sequence[int], irows: Sequence[int]) -> bytes:
+    n = len(hashes)
+    width = (n + 7) >> 3
+    buf = bytearray(_header.pack(_magic, _version, hsz, n))
+    buf += b''.join(hashes)
+    for name in names:
+        # Cut on a character boundary so the name still decodes.
+        b = name.encode('utf-8')[:0xffff].decode('utf-8', 'ignore').encode('utf-8')
+        buf += _u16.pack(len(b))
+        buf += b
+    _encode_rows(buf, frows, width)
+    _encode_rows(buf, irows, width)
+    return zlib.compress(bytes(buf), 9)
+
+def decode(data: bytes) -> tuple[int, list[bytes], list[str], list[int], list[int]]:
+    """Inverse of `encode`: (hash size, hashes, names, fset rows, iset rows)."""
+    rd = _Reader(zlib.decompress(data))
+    magic, version, hsz, n = _header.unpack_from(rd.data, 0)
+    rd.off = _header.size
+    if magic != _magic:
+        raise ValueError('Not an Oracle export')
+    if version > _version:
+        raise ValueError(f'Export format {version} is newer than supported {_version}')
+    hashes = [rd.take(hsz) for _ in range(n)]
+    names = [rd.take(rd.unpack(_u16)).decode('utf-8', 'replace') for _ in range(n)]
+    width = (n + 7) >> 3
+    frows = _decode_rows(rd, n, width)
+    irows = _decode_rows(rd, n, width)
+    return hsz, hashes, names, frows, irows
@@ -0,0 +1,101 @@
+import threading
+from collections.abc import Collection
+
+from mobase import IModInterface, IModList, IOrganizer  # pyright: ignore [reportMissingModuleSource]
+from PyQt6.QtCore import QObject, pyqtSignal
+
+from plugin_oracle.base.oracle.oracle import Oracle
+from plugin_oracle.util.log import PluginLogger, getLogger
+
+
+class Resolver(QObject):
+    """
+    Resolves mod hashes on a background thread.
+
+    Hashing happens off the UI thread; `progress(done, total)` is emitted as mods
+    finish and `finished()` once a pass is complete. The results are entered
+    into the database from the thread the resolver lives on, i.e. the UI thread,
+    through a queued connection.
+    """
+    progress = pyqtSignal(int, int)
+    finished = pyqtSignal()
+    _resolved = pyqtSignal(object)
+
+    def __init__(self, oracle: Oracle, mlist: IModList, organizer: IOrganizer) -> None:
+        super().__init__()
+        self._log: PluginLogger = PluginLogger(getLogger(__name__), {'name': 'Resolver'})
+        self.oracle: Oracle = oracle
+        self._mlist: IModList = mlist
+        self._organizer: IOrganizer = organizer
+        self._thread: threading.Thread | None = None
+        self._again: bool = False
+        self._verbose: bool = False
+        self._load: bool = False
+        self._stale: bool = False
+        self._guard: threading.Lock = threading.Lock()
+        _ = self._resolved.connect(self._register) # pyright: ignore [reportUnknownMemberType]
+
+    def busy(self) -> bool:
+        with self._guard:
+            return self._thread is not None
+
+    def start(self, verbose: bool = False, load: bool = False, stale: bool = False) -> None:
+        """
+        Begin a background pass, or queue one more if a pass is already running.
+
+        With `load` the database is read first, on the same thread. With `stale`
+        the index is first checked for archives that changed, and their mods
+        are looked up again.
+        """
+        with self._guard:
+            self._verbose |= verbose
+            self._load |= load
+            self._stale |= stale
+            if self._thread is not None:
+                self._again = True
+                return
+            self._thread = threading.Thread(target=self._run, name='oracle-resolve', daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        try:
+            while True:
+                with self._guard:
+                    verbose = self._verbose
+                    load = self._load
+                    stale = self._stale
+                    self._verbose = self._load = self._stale = False
+                    self._again = False
+                try:
+                    if load:
+                        self.oracle.load()
+                    if stale:
+                        self.oracle.invalidate(self.oracle.stale(), force=True)
+                    mods = self.oracle._resolve(self._mlist, self._organizer, verbose, progress=self.progress.emit) # pyright: ignore [reportPrivateUsage]
+                    self._resolved.emit(mods)
+                except (OSError, ValueError) as e:
+                    self._log.warning(f'Background resolve failed: {e}')
+                with self._guard:
+                    if not self._again:
+                        self._thread = None
+                        break
+        finally:
+            # Anything else escapes with its traceback, but the next start() must still get a thread.
+            with self._guard:
+                if self._thread is threading.current_thread():
+                    self._thread = None
+            self.finished.emit()
+
+    def _register(self, mods: list[tuple[bytes, IModInterface]]) -> None:
+        self.oracle.register(mods, self._organizer)
+
+    def wait(self, names: Collection[str]) -> None:
+        """
+        Resolve just the named mods now, on the calling thread.
+
+        Mods a background pass is already hashing are waited for; only those no
+        pass covers are hashed here.
+        """
+        mods = self.oracle._resolve(self._mlist, self._organizer, only=names) # pyright: ignore [reportPrivateUsage]
+        wanted = set(names)
+        self.oracle.register([m for m in mods if m[1].name() in wanted], self._organizer)
@@ -0,0 +1,132 @@
+"""
+Pickle-free on-disk container for MDB checkpoints.
+
+Layout (all integers little endian):
+
+* header: magic, format version, hash size, mod count, row stride in bytes
+* mod table: `count` hashes of `hash size` bytes each
+* follow set rows: `count` rows of `stride` bytes
+* incomparability rows: `count` rows of `stride` bytes
+* names: `count` entries of a u16 length followed by utf-8 bytes
+
+Rows have a fixed stride so any one of them can be located without reading
+the others, which lets the file be memory mapped and paged in lazily.
+"""
+import mmap
+import os
+import struct
+from collections.abc import Iterable, Iterator, Sequence
+from typing import overload
+
+_magic: bytes = b'ORDB'
+_version: int = 1
+_header: struct.Struct = struct.Struct('<4sHHII')
+_nlen: struct.Struct = struct.Struct('<H')
+
+class Rows(Sequence[int]):
+    """Bitset rows, read from a mapped checkpoint the first time they are touched."""
+
+    def __init__(self, rows: Iterable[int] = (), buf: mmap.mmap | None = None, offset: int = 0, stride: int = 0, count: int = 0) -> None:
+        self._rows: list[int | None] = [None] * count if buf is not None else list(rows)
+        self._buf: mmap.mmap | None = buf
+        self._offset: int = offset
+        self._stride: int = stride
+        # Bits OR'd into rows that were still on disk when mods were registered.
+        self._widen: int = 0
+
+    def _page(self, i: int) -> int:
+        assert self._buf is not None
+        o = self._offset + i * self._stride
+        r = int.from_bytes(self._buf[o:o + self._stride], 'little') | self._widen
+        self._rows[i] = r
+        return r
+
+    @overload
+    def __getitem__(self, i: int) -> int: ...
+    @overload
+    def __getitem__(self, i: slice) -> list[int]: ...
+    def __getitem__(self, i: int | slice) -> int | list[int]:
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self._rows)))]
+        r = self._rows[i]
+        if r is None:
+            return self._page(i)
+        return r
+
+    def __setitem__(self, i: int, v: int) -> None:
+        self._rows[i] = v
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __iter__(self) -> Iterator[int]:
+        for i in range(len(self._rows)):
+            yield self[i]
+
+    def extend(self, rows: Iterable[int]) -> None:
+        self._rows.extend(rows)
+
+    def widen(self, bits: int) -> None:
+        """OR `bits` into every current row without paging in the unread ones."""
+        rows = self._rows
+        for i, r in enumerate(rows):
+            if r is not None:
+                rows[i] = r | bits
+        self._widen |= bits
+
+    def detach(self) -> None:
+        """Page in everything and drop the reference to the mapping."""
+        if self._buf is None:
+            return
+        for i, r in enumerate(self._rows):
+            if r is None:
+                _ = self._page(i)
+        self._buf = None
+        self._widen = 0
+
+def stride(count: int) -> int:
+    return ((count + 63) >> 6) << 3
+
+def write(path: str, hsz: int, hashes: list[bytes], names: list[str], frows: Rows, irows: Rows) -> None:
+    n = len(hashes)
+    w = stride(n)
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        _ = f.write(_header.pack(_magic, _version, hsz, n, w))
+        _ = f.write(b''.join(hashes))
+        for rows in (frows, irows):
+            _ = f.write(b''.join(r.to_bytes(w, 'little') for r in rows))
+        for name in names:
+            # Cut on a character boundary so the name still decodes.
+            b = name.encode('utf-8')[:0xffff].decode('utf-8', 'ignore').encode('utf-8')
+            _ = f.write(_nlen.pack(len(b)))
+            _ = f.write(b)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+def read(path: str) -> tuple[int, list[bytes], list[str], Rows, Rows, mmap.mmap]:
+    """Map a checkpoint, returning (hash size, hashes, names, fset rows, iset rows, mapping)."""
+    with open(path, 'rb') as f:
+        buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, version, hsz, n, w = _header.unpack_from(buf, 0)
+    if magic != _magic:
+        buf.close()
+        raise ValueError(f'{path} is not an Oracle database')
+    if version > _version:
+        buf.close()
+        raise ValueError(f'{path} uses database format {version}, newer than supported {_version}')
+    off = _header.size
+    hashes = [buf[off + i * hsz:off + (i + 1) * hsz] for i in range(n)]
+    off += n * hsz
+    frows = Rows(buf=buf, offset=off, stride=w, count=n)
+    off += n * w
+    irows = Rows(buf=buf, offset=off, stride=w, count=n)
+    off += n * w
+    names: list[str] = []
+    for _ in range(n):
+        ln, = _nlen.unpack_from(buf, off)
+        off += _nlen.size
+        names.append(buf[off:off + ln].decode('utf-8', 'replace'))
+        off += ln
+    return hsz, hashes, names, frows, irows, buf
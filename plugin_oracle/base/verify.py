@@ -0,0 +1,132 @@
+from collections.abc import Collection, Iterable, Mapping
+from dataclasses import dataclass
+from itertools import islice
+
+from plugin_oracle.base.db import MDB
+from plugin_oracle.util.bits import bits, prefixes
+
+
+@dataclass
+class Contradiction:
+    """`peer` claims `mod` must precede `follower`, but a working local order had them reversed."""
+    peer: str
+    mod: bytes
+    follower: bytes
+
+class Verifier:
+    """
+    Checks follow sets received from peers against locally observed working orders.
+
+    A peer only asserts that `a` must precede `b` when `b` is in its follow set
+    of `a` but `a` is not in its follow set of `b`. Pairs it never saw together
+    sit in both and claim nothing. For every mod the verifier keeps the bitset
+    of mods that preceded it in at least one working order, so candidate
+    contradictions for a whole row come out of a single AND. Nothing else is
+    kept per order; a witness is found by scanning the run history on request.
+    Orders from the run history can be deferred, so they are only indexed once
+    a check needs them.
+    """
+
+    def __init__(self, db: MDB) -> None:
+        self.db: MDB = db
+        self._before: dict[int, int] = {}
+        self._count: int = 0
+        self._backlog: tuple[Iterable[tuple[bool, list[bytes]]], int] | None = None
+
+    def __len__(self) -> int:
+        self._backfill()
+        return self._count
+
+    def defer(self, runs: Iterable[tuple[bool, list[bytes]]], count: int) -> None:
+        """Index the working orders among the first `count` of `runs` when first needed rather than now."""
+        self._backlog = (runs, count)
+
+    def _backfill(self) -> None:
+        if self._backlog is None:
+            return
+        runs, count = self._backlog
+        self._backlog = None
+        self.add_many(order for result, order in islice(runs, count) if result)
+
+    def add(self, order: list[bytes]) -> None:
+        """Index a load order that was observed to work."""
+        _ = self.db.register_many(order)
+        slots = self.db.slots(order)
+        before = self._before
+        for s, prefix in prefixes(slots):
+            before[s] = before.get(s, 0) | prefix
+        self._count += 1
+
+    def add_many(self, orders: Iterable[list[bytes]]) -> None:
+        for order in orders:
+            self.add(order)
+
+    @staticmethod
+    def witness(c: Contradiction, runs: Iterable[tuple[bool, list[bytes]]]) -> int:
+        """Index among `runs` of a working order in which `c.follower` came before `c.mod`, or -1."""
+        for k, (result, order) in enumerate(runs):
+            if not result or c.follower not in order:
+                continue
+            j = order.index(c.follower)
+            if c.mod in order[j + 1:]:
+                return k
+        return -1
+
+    def check(self, other: MDB, peer: str = '') -> list[Contradiction]:
+        """Every ordering constraint in `other`'s follow sets that a working local order disproves."""
+        self._backfill()
+        # Mods we do not know cannot contradict our orders, so nothing is registered.
+        remap, tr = self.db.translate(other, register=False)
+        src = other.rows()
+        known = self.db.mask(other.fsets)
+        rows = {s: tr(src[j]) for j, s in enumerate(remap) if s >= 0}
+        before = self._before
+        pairs: list[tuple[int, int]] = []
+        claimed = sum((rows[a] & before[a]).bit_count() for a in rows if a in before)
+        removed = sum((known & ~r).bit_count() for r in rows.values())
+        # Walk whichever side is sparser: candidate claims against our evidence,
+        # or the pairs the peer saw reversed against those candidates.
+        if claimed <= removed:
+            for a, r in rows.items():
+                for b in bits(r & before.get(a, 0)):
+                    # `b` claimed to follow `a`; that is only a constraint if `a` may not follow `b`.
+                    if not (rows[b] >> a) & 1:
+                        pairs.append((a, b))
+        else:
+            for b, r in rows.items():
+                for a in bits(known & ~r):
+                    if (rows[a] >> b) & 1 and (before.get(a, 0) >> b) & 1:
+                        pairs.append((a, b))
+        return [Contradiction(peer, self.db.hash(a), self.db.hash(b)) for a, b in sorted(pairs)]
+
+    def check_removals(self, edges: list[tuple[bytes, list[bytes]]], removed: Mapping[bytes, Collection[bytes]], peer: str = '') -> list[Contradiction]:
+        """
+        Every ordering constraint a peer's follow set removals add that a working local order disproves.
+
+        `edges` are the (mod, dropped followers) pairs of one incoming entry and
+        `removed` everything the same peer has dropped so far, this entry
+        included. The peer's follow sets started out full, so dropping `a` from
+        `b`'s claims `a` before `b` for as long as `b` stays in `a`'s.
+        """
+        self._backfill()
+        before = self._before
+        out: list[tuple[int, int]] = []
+        for follower, mods in edges:
+            b = self.db.slot(follower)
+            if b is None:
+                continue
+            for mod in mods:
+                a = self.db.slot(mod)
+                if a is not None and (before.get(a, 0) >> b) & 1 and follower not in removed.get(mod, ()):
+                    out.append((a, b))
+        return [Contradiction(peer, self.db.hash(a), self.db.hash(b)) for a, b in sorted(out)]
+
+    @staticmethod
+    def offenders(report: list[Contradiction]) -> set[bytes]:
+        """
+        Mods whose rows in the peer's database carry the contradicted claims.
+
+        The peer asserts `c.mod` before `c.follower` by having dropped `c.mod`
+        from the follow set of `c.follower`, so that row is the one to leave out.
+        """
+        return {c.follower for c in report}
@@ -0,0 +1,116 @@
+import os
+
+from mobase import IOrganizer  # pyright: ignore [reportMissingModuleSource]
+from PyQt6.QtCore import QFileSystemWatcher, QObject, QTimer
+
+from plugin_oracle.base.oracle.oracle import Oracle
+from plugin_oracle.base.resolver import Resolver
+from plugin_oracle.util.log import PluginLogger, getLogger
+
+# Files MO2 rewrites on its own; touching them does not change what the game loads.
+_ignored: frozenset[str] = frozenset({'meta.ini'})
+
+def _snapshot(path: str) -> dict[str, tuple[int, int]]:
+    out: dict[str, tuple[int, int]] = {}
+    try:
+        with os.scandir(path) as it:
+            for e in it:
+                if e.name.lower() in _ignored:
+                    continue
+                try:
+                    st = e.stat()
+                    out[e.name] = (st.st_size, st.st_mtime_ns)
+                except OSError:
+                    pass
+    except OSError:
+        pass
+    return out
+
+class Watcher(QObject):
+    """
+    Watches the mods and downloads folders and re-resolves only what changed.
+
+    Only those two folders hold a watch, so mods being installed or removed
+    and archives changing are noticed as they happen; a handle per mod folder
+    or file would run to thousands. Changes to the top level of a mod folder
+    are caught by `check` instead, which compares the folders about to be
+    loaded against snapshots taken when they were first seen. A mod whose files
+    changed is invalidated and flagged on the oracle, which keeps it out of
+    observations until the user decides what the change means. Changes to the
+    downloads folder are batched, and the resolver then checks the index for
+    changed archives on its own thread. Edits deep inside a mod's subfolders,
+    or made while MO2 is closed, go unnoticed.
+    """
+    _delay: int = 1000
+
+    def __init__(self, oracle: Oracle, resolver: Resolver, organizer: IOrganizer) -> None:
+        super().__init__()
+        self._log: PluginLogger = PluginLogger(getLogger(__name__), {'name': 'Watcher'})
+        self.oracle: Oracle = oracle
+        self.resolver: Resolver = resolver
+        self._mods: str = os.path.normpath(organizer.modsPath())
+        self._downloads: str = os.path.normpath(organizer.downloadsPath())
+        self._fsw: QFileSystemWatcher = QFileSystemWatcher()
+        self._folders: dict[str, dict[str, tuple[int, int]]] = {}
+        self._started: bool = False
+        self._timer: QTimer = QTimer()
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(Watcher._delay)
+        _ = self._timer.timeout.connect(self.resolver.start) # pyright: ignore [reportUnknownMemberType]
+        self._scan: QTimer = QTimer()
+        self._scan.setSingleShot(True)
+        self._scan.setInterval(Watcher._delay)
+        _ = self._scan.timeout.connect(self._rescan) # pyright: ignore [reportUnknownMemberType]
+        _ = self._fsw.directoryChanged.connect(self._on_directory) # pyright: ignore [reportUnknownMemberType]
+
+    def start(self) -> None:
+        if self._started:
+            return
+        self._started = True
+        _ = self._fsw.addPaths([self._mods, self._downloads]) # pyright: ignore [reportUnknownMemberType]
+        try:
+            names = [e.name for e in os.scandir(self._mods) if e.is_dir()]
+        except OSError as e:
+            self._log.warning(f'Cannot watch {self._mods}: {e}')
+            return
+        for name in names:
+            self._folders[name] = _snapshot(os.path.join(self._mods, name))
+        self._log.info(f'Tracking {len(self._folders)} mod folders')
+
+    def check(self, names: list[str]) -> None:
+        """Flag and invalidate the named mods whose folders changed since they were last looked at."""
+        changed: list[str] = []
+        for name in names:
+            if name not in self._folders:
+                continue
+            snap = _snapshot(os.path.join(self._mods, name))
+            if snap != self._folders[name]:
+                self._folders[name] = snap
+                changed.append(name)
+        if changed:
+            self._log.info(f'{len(changed)} mods changed in place: {", ".join(changed[:10])}')
+            self.oracle.invalidate(changed, force=True)
+            self.oracle.flag(changed)
+
+    def _rescan(self) -> None:
+        self.resolver.start(stale=True)
+
+    def _on_directory(self, path: str) -> None:
+        path = os.path.normpath(path)
+        if path == self._mods:
+            try:
+                now = {e.name for e in os.scandir(self._mods) if e.is_dir()}
+            except OSError:
+                return
+            added = sorted(now - self._folders.keys())
+            removed = sorted(self._folders.keys() - now)
+            for name in added:
+                self._folders[name] = _snapshot(os.path.join(self._mods, name))
+            for name in removed:
+                del self._folders[name]
+            if added or removed:
+                self.oracle.invalidate(added + removed, force=True)
+                self._timer.start()
+        elif path == self._downloads:
+            # Archives that moved or changed under a mod make its index entry stale.
+            self._scan.start()
@@ -1,19 +1,22 @@
 from PyQt6.QtCore import QPointF, Qt
 from PyQt6.QtGui import QMouseEvent, QPaintEvent, QWheelEvent, QPainter
-from PyQt6.QtWidgets import QWidget, QTabWidget, QVBoxLayout, QLabel, QPushButton, QMessageBox
+from PyQt6.QtWidgets import QWidget, QTabWidget, QVBoxLayout, QPushButton, QMessageBox, QFileDialog, QProgressBar
 from typing import Callable
 
 from plugin_oracle.base.oracle.oracle import Oracle
-from plugin_oracle.util.ml.graph import random_toposort
+from plugin_oracle.base.resolver import Resolver
+from plugin_oracle.util.bits import bits
 from plugin_oracle.util.render.metro import MetroRender, MetroConfig
 
 class OracleWidget(QWidget):
-    def __init__(self, oracle: Oracle, samplers: list[Callable[[bool], None]], reporter: Callable[[], str], permutation: Callable[[], list[bytes]]) -> None:
+    def __init__(self, oracle: Oracle, samplers: list[Callable[[bool], None]], reporter: Callable[[], str], permutation: Callable[[], list[bytes]], importer: Callable[[str], str], resolver: Resolver | None = None, merger: Callable[[list[str]], str] | None = None) -> None:
         super().__init__()
         self.oracle: Oracle = oracle
         self.sample: list[Callable[[bool], None]] = samplers
         self.permutation: Callable[[], list[bytes]] = permutation
         self.report: Callable[[], str] = reporter
+        self.importer: Callable[[str], str] = importer
+        self.merger: Callable[[list[str]], str] | None = merger
         self.setWindowTitle("Oracle")
         layout = QVBoxLayout()
         self.setLayout(layout)
@@ -22,38 +25,51 @@ class OracleWidget(QWidget):
         layouts: list[QVBoxLayout] = [QVBoxLayout()]
         tabnames: list[str] = ['Graph']
 
-        fsets = self.oracle.db.fsets
-        hmap = {m.hash: m.name for m in self.oracle.db.mods.values()}
-        tsort = random_toposort(fsets)
-        if tsort is None:
-            label = QLabel("Cannot render: the mod graph contains a cycle.")
-            layouts[0].addWidget(label)
-        else:
-            edgelist: list[tuple[bytes, bytes]] = []
-            perm = self.permutation()
-            for hash in perm:
-                for f in fsets[hash]:
-                    if f in perm:
-                        edgelist.append((hash, f))
-            label_dict = {k: hmap.get(k, k.hex()) for k in fsets.keys()}
-            graph_widget = OracleGraph(edgelist, label_dict)
-            layouts[0].addWidget(graph_widget)
+        db = self.oracle.db
+        hmap = {m.hash: m.name for m in db.mods.values()}
+        perm = self.permutation()
+        # Mods caught in a cycle of the asserted order are drawn as one node, which leaves
+        # a DAG, and only the edges its transitive reduction keeps are drawn.
+        q = self.oracle.quotient(perm)
+        heads = [db.hash(m[0]) for m in q.members]
+        edgelist: list[tuple[bytes, bytes]] = []
+        for c, head in enumerate(heads):
+            for d in bits(q.hasse[c]):
+                edgelist.append((head, heads[d]))
+        label_dict = {head: ' = '.join(hmap.get(db.hash(s), db.hash(s).hex()) for s in q.members[c]) for c, head in enumerate(heads)}
+        graph_widget = OracleGraph(edgelist, label_dict)
+        layouts[0].addWidget(graph_widget)
         for i in range(len(tabs)):
             tabs[i].setLayout(layouts[i])
             _ = tab_widget.addTab(tabs[i], tabnames[i])
         layout.addWidget(tab_widget)
 
+        self.progress: QProgressBar = QProgressBar()
+        self.progress.setFormat('Hashing mods: %v/%m')
+        self.progress.setVisible(resolver is not None and resolver.busy())
+        layout.addWidget(self.progress)
+        if resolver is not None:
+            _ = resolver.progress.connect(self.on_progress) # pyright: ignore [reportUnknownMemberType]
+            _ = resolver.finished.connect(self.on_resolved) # pyright: ignore [reportUnknownMemberType]
+
         # Add buttons below the tab contents
         btn_sample = QPushButton("Sample")
         btn_samplerandom = QPushButton("Sample Random")
         btn_predict = QPushButton("Predict")
+        btn_import = QPushButton("Import Profiles")
         layout.addWidget(btn_sample)
         layout.addWidget(btn_samplerandom)
         layout.addWidget(btn_predict)
+        layout.addWidget(btn_import)
 
         _ = btn_sample.clicked.connect(self.on_sample)             # pyright: ignore [reportUnknownMemberType]
         _ = btn_samplerandom.clicked.connect(self.on_samplerandom) # pyright: ignore [reportUnknownMemberType]
         _ = btn_predict.clicked.connect(self.on_predict)           # pyright: ignore [reportUnknownMemberType]
+        _ = btn_import.clicked.connect(self.on_import)             # pyright: ignore [reportUnknownMemberType]
+        if merger is not None:
+            btn_merge = QPushButton("Merge Databases")
+            layout.addWidget(btn_merge)
+            _ = btn_merge.clicked.connect(self.on_merge)           # pyright: ignore [reportUnknownMemberType]
 
     def on_sample(self):
         try:
@@ -74,6 +90,35 @@ class OracleWidget(QWidget):
         except Exception as e:
             _ = QMessageBox.warning(self, "Predict Error", str(e))
 
+    def on_progress(self, done: int, total: int):
+        self.progress.setMaximum(total)
+        self.progress.setValue(done)
+        self.progress.setVisible(done < total)
+
+    def on_resolved(self):
+        self.progress.setVisible(False)
+
+    def on_import(self):
+        path = QFileDialog.getExistingDirectory(self, "Select profiles or backups folder")
+        if not path:
+            return
+        try:
+            result = self.importer(path)
+            _ = QMessageBox.information(self, "Import Profiles", result)
+        except (OSError, ValueError) as e:
+            _ = QMessageBox.warning(self, "Import Error", str(e))
+
+    def on_merge(self):
+        assert self.merger is not None
+        paths, _ = QFileDialog.getOpenFileNames(self, "Select databases to merge", "", "Oracle databases (db.bin db.pkl *.orx)")
+        if not paths:
+            return
+        try:
+            result = self.merger(paths)
+            _ = QMessageBox.information(self, "Merge Databases", result)
+        except (OSError, ValueError) as e:
+            _ = QMessageBox.warning(self, "Merge Error", str(e))
+
 class OracleGraph(QWidget):
     def __init__(self, edgelist: list[tuple[bytes, bytes]], label_dict: dict[bytes, str], parent: QWidget | None = None) -> None:
         super().__init__(parent)
@@ -4,10 +4,18 @@ from PyQt6.QtGui import QIcon
 from PyQt6.QtWidgets import QMessageBox, QMainWindow
 
 import os
+from time import time
+from typing import TYPE_CHECKING
 
-from plugin_oracle.base.window import OracleWidget
 from plugin_oracle.util.log import PluginLogger, getLogger
 from plugin_oracle.base.oracle.oracle import Oracle
+from plugin_oracle.base.resolver import Resolver
+from plugin_oracle.util.mod.mo2 import allMods, isActive, isEssential
+
+if TYPE_CHECKING:
+    from plugin_oracle.base.peers import Peers
+    from plugin_oracle.base.watcher import Watcher
+    from plugin_oracle.base.window import OracleWidget
 
 class OraclePlugin(IPluginTool):
     _organizer: IOrganizer
@@ -43,20 +51,27 @@ class OraclePlugin(IPluginTool):
         return True
     
     def init(self, organizer: IOrganizer) -> bool:
+        t0 = time()
         self._organizer = organizer
 
         self._modlist = organizer.modList()
         self._pluginlist = organizer.pluginList()
         self.oracle: Oracle = Oracle(organizer.getPluginDataPath() + '/' + self.name())        
+        self.oracle.hasher.per_device = max(1, int(self._organizer.pluginSetting(self.name(), 'read_concurrency') or 4)) # pyright: ignore [reportArgumentType]
+        self.resolver: Resolver = Resolver(self.oracle, self._modlist, organizer)
+        self.watcher: Watcher | None = None
+        self.peers: Peers | None = None
         self._wdgt: OracleWidget | None = None
         res = self._organizer.onUserInterfaceInitialized(self.onInit)
         res |= self._organizer.onAboutToRun(self.onRun)
         res |= self._organizer.onFinishedRun(self.onExit)
         res |= self._modlist.onModInstalled(self.onInstall)
+        res |= self._modlist.onModRemoved(self.onRemove)
         if not res:
             self._log.error('Failed to register plugin handlers!')
             return False
-        
+        t1 = time()
+        self._log.info(f'Initialised in {t1 - t0}s')
         return self.checkversion()
     
     def name(self) -> str:
@@ -76,7 +91,10 @@ class OraclePlugin(IPluginTool):
     
     def settings(self) -> list[PluginSetting]:
         return [
-            PluginSetting('enabled', 'enable this plugin', True)
+            PluginSetting('enabled', 'enable this plugin', True),
+            PluginSetting('read_concurrency', 'archives read at once per disk (1 for spinning disks)', 4),
+            PluginSetting('peer_listen', 'host:port to serve follow sets to other instances on (empty to not serve)', ''),
+            PluginSetting('peers', 'comma separated host:port of instances to sync follow sets with', '')
         ]
     
     def isActive(self) -> bool:
@@ -88,22 +106,84 @@ class OraclePlugin(IPluginTool):
     def icon(self) -> QIcon:
         return QIcon()
     
+    def _ready(self) -> bool:
+        """Block until the background load of the database has finished; False if it failed."""
+        if not self.oracle.settled.is_set():
+            t0 = time()
+            _ = self.oracle.settled.wait()
+            t1 = time()
+            self._log.info(f'Waited {t1 - t0}s for the database to load')
+        return self.oracle.loaded.is_set()
+
+    def _active(self) -> list[str]:
+        mlist = self._modlist
+        return [mod.name() for mod in allMods(mlist) if isActive(mod, mlist) or isEssential(mod, mlist)]
+
     def display(self) -> None:
-        self.oracle.resolve(self._modlist, self._organizer, False)
+        from plugin_oracle.base.window import OracleWidget
+        _ = self._ready()
+        # Folders may have been touched outside MO2; recheck their mtimes once.
+        self.oracle.invalidate()
+        self.resolver.start()
         if self._wdgt is not None:
             _ = self._wdgt.close()
             del self._wdgt
-        self._wdgt = OracleWidget(self.oracle, [self.sample], self.predict, self.permutation)
+        self._wdgt = OracleWidget(self.oracle, [self.sample], self.predict, self.permutation, self.importProfiles, self.resolver, self.merge)
         self._wdgt.show()
 
+    def _peers(self) -> 'Peers | None':
+        from plugin_oracle.base.peers import Peers, address
+        listen = str(self._organizer.pluginSetting(self.name(), 'peer_listen') or '')
+        peers = str(self._organizer.pluginSetting(self.name(), 'peers') or '')
+        try:
+            return Peers(self.oracle, address(listen) if listen.strip() else None, [address(p) for p in peers.split(',') if p.strip()])
+        except ValueError as e:
+            self._log.error(f'Peer settings are invalid, not syncing: {e}')
+            return None
+
     def onInit(self, _: QMainWindow) -> None:
-        self.oracle.load()
-        self.oracle.resolve(self._modlist, self._organizer)
+        from plugin_oracle.base.watcher import Watcher
+        # Loading and hashing happen on the resolver thread; the UI is already up.
+        self.resolver.start(True, load=True)
+        self.watcher = Watcher(self.oracle, self.resolver, self._organizer)
+        # Scanning every mod folder can wait until the first pass is done.
+        _ = self.resolver.finished.connect(self.watcher.start) # pyright: ignore [reportUnknownMemberType]
+        self.peers = self._peers()
+        if self.peers is not None:
+            _ = self.resolver.finished.connect(self.peers.start) # pyright: ignore [reportUnknownMemberType]
 
     def onRun(self, _: str, _1: QDir, _2: str) -> bool:
-        self.oracle.resolve(self._modlist, self._organizer, False)
+        if not self._ready():
+            # Nothing will be recorded for this run, so there is nothing to resolve.
+            return True
+        active = self._active()
+        if self.watcher is not None:
+            self.watcher.check(active)
+        self._settle(active)
+        # Only what is about to be loaded has to be known before the game starts.
+        self.resolver.wait(active)
         return True
 
+    def _settle(self, names: list[str]) -> None:
+        """Ask what to do about flagged mods among `names`; undecided ones stay flagged and unobserved."""
+        flagged = [n for n in names if n in self.oracle.flagged]
+        if not flagged:
+            return
+        reply = QMessageBox.question(None, 'Oracle',
+            'These mods changed in place since they were hashed:\n\n' + '\n'.join(flagged[:20])
+            + ('\n...' if len(flagged) > 20 else '')
+            + '\n\nYes: treat them as new mods and forget what was learned about them.'
+            + '\nNo: keep what was learned; the change does not matter.'
+            + '\nCancel: decide later; runs are recorded without them until then.',
+            QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No | QMessageBox.StandardButton.Cancel,
+            QMessageBox.StandardButton.Cancel)
+        if reply == QMessageBox.StandardButton.Yes:
+            missing = self.oracle.renew(flagged, self._modlist)
+            if missing:
+                self._log.warning(f'Could not renew {len(missing)} mods without an index entry: {", ".join(missing[:10])}')
+        elif reply == QMessageBox.StandardButton.No:
+            self.oracle.unflag(flagged)
+
     def onExit(self, game: str, code: int) -> None:
         game = os.path.basename(game)
         if game.endswith('.exe'):
@@ -120,20 +200,57 @@ class OraclePlugin(IPluginTool):
 
                 if reply == QMessageBox.StandardButton.No:
                     res = False
+            if not self._ready():
+                self._log.error('The database did not load; this run is not recorded')
+                return
+            self.resolver.wait(self._active())
             self.oracle.observe(res, self._modlist, self._organizer)
             self.oracle.save()
+            if self.peers is not None:
+                self.peers.sync()
         
     def onInstall(self, mod: IModInterface) -> None:
-        _ = self.oracle.addMod(mod, self._organizer)
+        self.oracle.invalidate([mod.name()])
+        self.resolver.start()
+
+    def onRemove(self, name: str) -> None:
+        self.oracle.removeMod(name, self._organizer)
     
     def sample(self, random: bool = False) -> None:
+        _ = self._ready()
+        self.resolver.wait(self._active())
         if random:
             self.oracle.samplerandom(self._modlist, self._pluginlist, self._organizer)
         else:
             self.oracle.sample(self._modlist, self._pluginlist, self._organizer)
     
     def predict(self) -> str:
-        return self.oracle.predict(self._modlist, self._organizer)
+        _ = self._ready()
+        self.resolver.wait(self._active())
+        return self.oracle.predict(self._modlist, self._organizer).report()
     
+    def importProfiles(self, path: str) -> str:
+        if not self._ready():
+            return 'The database did not load; nothing was imported.'
+        # Profiles may name any installed mod, not just the active ones.
+        self.resolver.wait([mod.name() for mod in allMods(self._modlist)])
+        count = self.oracle.importProfiles([path], self._modlist, self._organizer)
+        self.oracle.save()
+        return f'Imported {count} load orders.'
+
+    def merge(self, paths: list[str]) -> str:
+        if not self._ready():
+            return 'The database did not load; nothing was merged.'
+        report = self.oracle.merge(paths)
+        self.oracle.save()
+        if self.peers is not None:
+            self.peers.sync()
+        if not report:
+            return f'Merged {len(paths)} databases.'
+        names = sorted({self.oracle.db.mod_req(c.follower).name for c in report})
+        return f'Merged {len(paths)} databases. Left out rows contradicting local load orders for {len(names)} mods: {", ".join(names[:10])}'
+
     def permutation(self) -> list[bytes]:
-        return self.oracle.permutation(self._modlist, self._organizer)
\ No newline at end of file
+        _ = self._ready()
+        # While hashing is still underway, make do with the mods already known.
+        return self.oracle.permutation(self._modlist, self._organizer, () if self.resolver.busy() else None)
\ No newline at end of file
@@ -0,0 +1,31 @@
+from collections.abc import Iterable, Iterator
+
+
+def mask(idx: Iterable[int]) -> int:
+    """Pack a collection of bit indices into an integer bitset."""
+    idx = list(idx)
+    if not idx:
+        return 0
+    buf = bytearray((max(idx) >> 3) + 1)
+    for i in idx:
+        buf[i >> 3] |= 1 << (i & 7)
+    return int.from_bytes(buf, 'little')
+
+def bits(x: int) -> Iterator[int]:
+    """Yield the indices of the set bits of x in ascending order."""
+    s = bin(x)[:1:-1]
+    i = s.find('1')
+    while i >= 0:
+        yield i
+        i = s.find('1', i + 1)
+
+def full(n: int) -> int:
+    """Bitset with the low n bits set."""
+    return (1 << n) - 1
+
+def prefixes(idx: Iterable[int]) -> Iterator[tuple[int, int]]:
+    """Yield (i, bitset of every index before i) along a sequence of indices."""
+    prefix = 0
+    for i in idx:
+        yield i, prefix
+        prefix |= 1 << i
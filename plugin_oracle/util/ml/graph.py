@@ -1,22 +1,479 @@
+import math
 import random
+from collections.abc import Iterable, Iterator, Mapping, Sequence
 
-def random_toposort(adj: dict[bytes, set[bytes]], seed: int = 0) -> list[bytes] | None:
-    """Return a random topological sort of the graph, or None if a cycle exists."""
-    indegree = {k: 0 for k in adj}
-    for vs in adj.values():
+from plugin_oracle.util.bits import bits, mask
+
+def _kahn(adj: Mapping[bytes, Iterable[bytes]]) -> tuple[list[bytes], list[list[int]], list[int]]:
+    """Index the graph once: node list, successor lists and in-degrees, all by node index."""
+    index: dict[bytes, int] = {k: i for i, k in enumerate(adj)}
+    nodes = list(index)
+    succ: list[list[int]] = [[] for _ in nodes]
+    for k, vs in adj.items():
+        out = succ[index[k]]
         for v in vs:
-            indegree[v] = indegree.get(v, 0) + 1
-    queue = [k for k, deg in indegree.items() if deg == 0]
-    L: list[bytes] = []
-    random.seed(seed)
+            j = index.get(v, None)
+            if j is None:
+                j = index[v] = len(nodes)
+                nodes.append(v)
+                succ.append([])
+            out.append(j)
+    indegree = [0] * len(nodes)
+    for out in succ:
+        for j in out:
+            indegree[j] += 1
+    return nodes, succ, indegree
+
+def _sort(succ: list[list[int]], indegree: list[int], sources: list[int], rng: random.Random) -> list[int] | None:
+    # Picking a random queue slot and swapping it to the end makes every pop O(1)
+    # while keeping each ready node equally likely.
+    indegree = indegree.copy()
+    queue = sources.copy()
+    L: list[int] = []
     while queue:
-        n = queue.pop(random.randrange(len(queue)))
+        i = rng.randrange(len(queue))
+        queue[i], queue[-1] = queue[-1], queue[i]
+        n = queue.pop()
         L.append(n)
-        for m in adj.get(n, set()):
+        for m in succ[n]:
             indegree[m] -= 1
             if indegree[m] == 0:
                 queue.append(m)
-    random.seed()
     if len(L) != len(indegree):
         return None
-    return L
\ No newline at end of file
+    return L
+
+def random_toposort(adj: Mapping[bytes, Iterable[bytes]], seed: int | None = None, rng: random.Random | None = None) -> list[bytes] | None:
+    """
+    Return a random topological sort of the graph, or None if a cycle exists.
+
+    Runs in O(V + E). Draws from `rng`, or a private generator seeded with `seed`
+    (fresh entropy when None); the global `random` state is left alone.
+    """
+    for order in random_toposorts(adj, 1, seed, rng):
+        return order
+    return None
+
+def random_toposorts(adj: Mapping[bytes, Iterable[bytes]], k: int, seed: int | None = None, rng: random.Random | None = None, attempts: int | None = None) -> Iterator[list[bytes]]:
+    """
+    Yield up to `k` distinct random topological sorts of the graph.
+
+    The graph is indexed once and every sort after that costs O(V + E). Fewer
+    than `k` come out when the graph has a cycle, or when `attempts` draws
+    (4k by default) turn up nothing new, e.g. because there are not that many.
+    """
+    if rng is None:
+        rng = random.Random(seed)
+    nodes, succ, indegree = _kahn(adj)
+    sources = [i for i, d in enumerate(indegree) if d == 0]
+    seen: set[tuple[int, ...]] = set()
+    for _ in range(4 * k if attempts is None else attempts):
+        if len(seen) >= k:
+            return
+        order = _sort(succ, indegree, sources, rng)
+        if order is None:
+            return
+        key = tuple(order)
+        if key in seen:
+            continue
+        seen.add(key)
+        yield [nodes[i] for i in order]
+
+def _members(m: int) -> list[int]:
+    return list(bits(m)) if m & (m - 1) else [m.bit_length() - 1]
+
+def _low(x: int) -> int:
+    return (x & -x).bit_length() - 1
+
+def scc(rows: Sequence[int], within: int | None = None) -> tuple[list[int], list[int]]:
+    """
+    Strongly connected components of a graph given as bitset adjacency rows.
+
+    Iterative path-based (Gabow) flavour of Tarjan's algorithm. Stack membership
+    is kept as a bitset, and every stack entry remembers the bitset of entries
+    beneath it, so back edges are resolved with a handful of word-wide ANDs per
+    node instead of a walk over the successor list.
+
+    Returns (component of each node, member bitset of each component). Components
+    are numbered in the order they complete, i.e. reverse topological order.
+    With `within`, only the subgraph on that bitset of nodes is considered and
+    every other node keeps component -1.
+    """
+    n = len(rows)
+    comp = [-1] * n
+    masks: list[int] = []
+    unvisited = (1 << n) - 1 if within is None else within
+    below = [0] * n
+    stack: list[int] = []
+    onstack = 0
+    bounds: list[int] = []
+    while unvisited:
+        root = _low(unvisited)
+        unvisited ^= 1 << root
+        below[root] = onstack
+        stack.append(root)
+        onstack |= 1 << root
+        bounds.append(root)
+        call = [root]
+        while call:
+            v = call[-1]
+            x = rows[v] & unvisited
+            if x:
+                w = _low(x)
+                unvisited ^= 1 << w
+                below[w] = onstack
+                stack.append(w)
+                onstack |= 1 << w
+                bounds.append(w)
+                call.append(w)
+                continue
+            _ = call.pop()
+            back = rows[v] & onstack
+            while back & below[bounds[-1]]:
+                _ = bounds.pop()
+            if bounds[-1] != v:
+                continue
+            _ = bounds.pop()
+            c = len(masks)
+            m = 0
+            while True:
+                w = stack.pop()
+                comp[w] = c
+                m |= 1 << w
+                if w == v:
+                    break
+            onstack &= ~m
+            masks.append(m)
+    return comp, masks
+
+class Closure:
+    """
+    Transitive closure and reduction of a DAG, kept current as its rows change.
+
+    Nodes are numbered in topological order, every edge going from a lower to a
+    higher node. Node `c` stands for the bitset `masks[c]` of indices, singletons
+    by default, with `of[i]` the node index `i` belongs to; this lets the nodes
+    of a condensation be closed without first renumbering its edges. `rows[c]`
+    is the bitset of indices `c` has an edge into.
+
+    Nodes are closed from the last one down, so whatever a successor reaches
+    is already known and is folded in with one word-wide OR; everything it
+    reaches then drops out of the rest of the row at once. A successor that
+    turns up inside what another one reaches is not a reduction edge.
+    `reach[c]` and `hasse[c]` are the bitsets of indices `c` reaches and of
+    those in its reduction successors. `update` redoes only the changed rows
+    and the nodes that reach a node whose closure actually moved; `splice`
+    replaces a run of nodes with a different grouping of the same indices.
+    """
+
+    def __init__(self, rows: Iterable[int] = (), masks: list[int] | None = None, of: Sequence[int] | None = None) -> None:
+        self.rows: list[int] = list(rows)
+        n = len(self.rows)
+        self.masks: list[int] = [1 << c for c in range(n)] if masks is None else masks
+        self.of: Sequence[int] = range(n) if of is None else of
+        self.reach: list[int] = [0] * n
+        self.hasse: list[int] = [0] * n
+        self._succ: list[list[int]] = [[] for _ in range(n)]
+        for c in range(n - 1, -1, -1):
+            _ = self._close(c)
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def _close(self, c: int) -> bool:
+        """Recompute node `c` from its row; True if its reach changed."""
+        reach = self.reach
+        masks = self.masks
+        of = self.of
+        x = self.rows[c] & ~masks[c]
+        acc = 0
+        implied = 0
+        picks: list[int] = []
+        while x:
+            d = of[_low(x)]
+            picks.append(d)
+            acc |= masks[d] | reach[d]
+            implied |= reach[d]
+            x &= ~acc
+        self.hasse[c] = acc & ~implied
+        self._succ[c] = [d for d in picks if not masks[d] & implied]
+        if acc == reach[c]:
+            return False
+        reach[c] = acc
+        return True
+
+    def update(self, rows: Mapping[int, int]) -> None:
+        """Replace the given rows and bring the closure and reduction up to date."""
+        dirty: set[int] = set()
+        for c, r in rows.items():
+            if r != self.rows[c]:
+                self.rows[c] = r
+                dirty.add(c)
+        self._refresh(dirty)
+
+    def _refresh(self, dirty: set[int]) -> None:
+        changed = 0
+        reach = self.reach
+        for c in range(max(dirty, default=-1), -1, -1):
+            # A node's old reach covers every node whose change could affect it.
+            if (c in dirty or reach[c] & changed) and self._close(c):
+                changed |= self.masks[c]
+
+    def splice(self, lo: int, hi: int, rows: list[int], masks: list[int]) -> None:
+        """
+        Replace nodes `lo` to `hi - 1` with new ones over the same indices and bring everything up to date.
+
+        The new nodes must be in topological order among themselves, and every
+        edge into or out of them must still run from a lower to a higher node.
+        """
+        k = len(rows)
+        shift = k - (hi - lo)
+        span = 0
+        for m in masks:
+            span |= m
+        reach = self.reach
+        # Whatever reaches into the span names its nodes among its successors.
+        dirty = {c for c in range(lo) if reach[c] & span}
+        self.rows[lo:hi] = rows
+        self.masks[lo:hi] = masks
+        reach[lo:hi] = [0] * k
+        self.hasse[lo:hi] = [0] * k
+        self._succ[lo:hi] = [[] for _ in range(k)]
+        of = list(self.of)
+        if shift:
+            for i, c in enumerate(of):
+                if c >= hi:
+                    of[i] = c + shift
+            for succ in self._succ:
+                succ[:] = [d + shift if d >= hi else d for d in succ]
+        for c in range(lo, lo + k):
+            for i in bits(masks[c - lo]):
+                of[i] = c
+        self.of = of
+        dirty.update(range(lo, lo + k))
+        self._refresh(dirty)
+
+    def successors(self, c: int) -> list[int]:
+        """Reduction successors of node `c`, as nodes."""
+        return self._succ[c]
+
+    def edges(self) -> Iterator[tuple[int, int]]:
+        """Edges of the transitive reduction, as pairs of nodes."""
+        for c in range(len(self.rows)):
+            for d in self.successors(c):
+                yield c, d
+
+class Quotient:
+    """
+    Condensation of the subgraph on `nodes`: one class per strongly connected component.
+
+    Nodes that all reach each other are interchangeable as far as the graph can
+    tell, so each such group becomes a single class and what is left is a DAG.
+    Classes are numbered in topological order. `members[c]` lists the nodes of
+    class `c`, `masks[c]` is their bitset and `of[v]` is the class of node `v`.
+    `closure` holds the closure and reduction between classes over node
+    bitsets, and `hasse[c]` is the bitset of classes `c` has reduction edges to.
+    """
+
+    def __init__(self, rows: Mapping[int, int] | Sequence[int], nodes: list[int]) -> None:
+        within = 0
+        for v in nodes:
+            within |= 1 << v
+        self._within: int = within
+        # The rows of the subgraph, by node.
+        self.rows: list[int] = [0] * (max(nodes) + 1 if nodes else 0)
+        sub = self.rows
+        for v in nodes:
+            sub[v] = rows[v] & within
+        comp, masks = scc(sub, within)
+        k = len(masks)
+        # `scc` numbers components as they complete, i.e. in reverse topological order.
+        self.masks: list[int] = masks[::-1]
+        # Most classes are single nodes; spell those out without scanning the mask.
+        self.members: list[list[int]] = [_members(m) for m in self.masks]
+        self.of: dict[int, int] = {v: k - 1 - comp[v] for v in nodes}
+        of = [-1 if c < 0 else k - 1 - c for c in comp]
+        self.closure: Closure = Closure([self._row(c) for c in range(k)], self.masks, of)
+        self.hasse: list[int] = [mask(self.closure.successors(c)) for c in range(k)]
+
+    def __len__(self) -> int:
+        return len(self.members)
+
+    def _row(self, c: int) -> int:
+        x = 0
+        for v in self.members[c]:
+            x |= self.rows[v]
+        return x
+
+    def update(self, rows: Mapping[int, int]) -> None:
+        """
+        Bring the classes up to date with new rows for some of the nodes.
+
+        Only a span of the topological order is condensed and sorted again, in
+        the manner of Pearce and Kelly: from the lowest to the highest class
+        that an edge now runs backwards between, or that lost an edge inside
+        it and may have come apart. Nothing outside the span can lie on a
+        cycle through it, so every other class keeps its members and place.
+        """
+        sub = self.rows
+        of = self.of
+        masks = self.masks
+        lo = len(masks)
+        hi = -1
+        touched: set[int] = set()
+        for v, r in rows.items():
+            c = of.get(v, None)
+            if c is None:
+                continue
+            r &= self._within
+            old = sub[v]
+            if r == old:
+                continue
+            sub[v] = r
+            touched.add(c)
+            x = r & ~old & ~masks[c]
+            while x:
+                d = of[_low(x)]
+                if d < c:
+                    lo = min(lo, d)
+                    hi = max(hi, c)
+                x &= ~masks[d]
+            if old & ~r & masks[c]:
+                lo = min(lo, c)
+                hi = max(hi, c)
+        if not touched:
+            return
+        if lo <= hi:
+            span = 0
+            for c in range(lo, hi + 1):
+                span |= masks[c]
+            _, parts = scc(sub, span)
+            parts.reverse()
+            shift = len(parts) - (hi + 1 - lo)
+            self.members[lo:hi + 1] = [_members(m) for m in parts]
+            for c in range(lo, len(self.members)):
+                for v in self.members[c]:
+                    of[v] = c
+            touched = {c + shift if c > hi else c for c in touched if not lo <= c <= hi}
+            # The closure shares `masks` with us and splices it too.
+            self.closure.splice(lo, hi + 1, [self._row(c) for c in range(lo, lo + len(parts))], parts)
+        self.closure.update({c: self._row(c) for c in touched})
+        self.hasse = [mask(self.closure.successors(c)) for c in range(len(self.members))]
+
+    def trivial(self) -> bool:
+        """Whether every class is a single node, i.e. the subgraph was already acyclic."""
+        return len(self.members) == len(self.of)
+
+    def expand(self, order: Iterable[int], rng: random.Random | None = None) -> list[int]:
+        """Nodes of the classes in `order`, each class shuffled with `rng` if given."""
+        out: list[int] = []
+        for c in order:
+            m = self.members[c]
+            if rng is not None and len(m) > 1:
+                m = m.copy()
+                rng.shuffle(m)
+            out.extend(m)
+        return out
+
+def _local(rows: Mapping[int, int] | Sequence[int], nodes: list[int]) -> tuple[list[list[int]], list[int]]:
+    """
+    Successor lists and in-degrees of the subgraph on `nodes`, by position in `nodes`.
+
+    Only the transitive reduction is kept when the subgraph is acyclic: it has
+    the same topological sorts and usually a small fraction of the edges.
+    """
+    index = {v: i for i, v in enumerate(nodes)}
+    q = Quotient(rows, nodes)
+    if q.trivial():
+        succ = [[index[q.members[d][0]] for d in bits(q.hasse[q.of[v]])] for v in nodes]
+    else:
+        within = 0
+        for v in nodes:
+            within |= 1 << v
+        succ = [[index[w] for w in bits(rows[v] & within)] for v in nodes]
+    indegree = [0] * len(nodes)
+    for out in succ:
+        for j in out:
+            indegree[j] += 1
+    return succ, indegree
+
+def linear_extensions(rows: Mapping[int, int] | Sequence[int], nodes: list[int], k: int = 1, burnin: int | None = None, thin: int | None = None, seed: int | None = None, rng: random.Random | None = None) -> Iterator[list[int]]:
+    """
+    Approximately uniform random linear extensions of a DAG.
+
+    `rows[v]` is the bitset of nodes `v` must precede; only `nodes` are ordered.
+    Starting from a random topological sort, a lazy Karzanov-Khachiyan chain
+    repeatedly picks an adjacent pair and swaps it unless one must precede the
+    other. Its stationary distribution is uniform over linear extensions.
+    The first order comes out after `burnin` steps and the others every
+    `thin` steps. The defaults, 8 n log2 n and n steps, are a practical
+    compromise well below the proven mixing bound. Yields nothing if the
+    graph has a cycle.
+    """
+    if rng is None:
+        rng = random.Random(seed)
+    n = len(nodes)
+    succ, indegree = _local(rows, nodes)
+    start = _sort(succ, indegree, [i for i, d in enumerate(indegree) if d == 0], rng)
+    if start is None:
+        return
+    order = [nodes[i] for i in start]
+    if n < 2:
+        for _ in range(k):
+            yield order.copy()
+        return
+    if burnin is None:
+        burnin = 8 * n * n.bit_length()
+    if thin is None:
+        thin = n
+    draw = rng.random
+    # Half the draws land past the end and leave the order as is, which keeps the chain aperiodic.
+    span = 2 * (n - 1)
+    steps = burnin
+    for _ in range(k):
+        for _ in range(steps):
+            i = int(draw() * span)
+            if i < n - 1:
+                u = order[i]
+                w = order[i + 1]
+                if not (rows[u] >> w) & 1:
+                    order[i] = w
+                    order[i + 1] = u
+        yield order.copy()
+        steps = thin
+
+def count_extensions(rows: Mapping[int, int] | Sequence[int], nodes: list[int], samples: int = 32, seed: int | None = None, rng: random.Random | None = None) -> float:
+    """
+    Estimate log2 of the number of linear extensions of the DAG on `nodes`.
+
+    Knuth's estimator: a random topological sort that picks uniformly among the
+    ready nodes, weighted by the product of the number of choices it had, is an
+    unbiased estimate of the count. The products of `samples` runs are averaged
+    exactly. 0 means the order is fully determined; -inf means there is a cycle.
+    """
+    if rng is None:
+        rng = random.Random(seed)
+    succ, indegree0 = _local(rows, nodes)
+    sources = [i for i, d in enumerate(indegree0) if d == 0]
+    total = 0
+    for _ in range(samples):
+        indegree = indegree0.copy()
+        queue = sources.copy()
+        weight = 1
+        placed = 0
+        while queue:
+            weight *= len(queue)
+            i = rng.randrange(len(queue))
+            queue[i], queue[-1] = queue[-1], queue[i]
+            v = queue.pop()
+            placed += 1
+            for m in succ[v]:
+                indegree[m] -= 1
+                if indegree[m] == 0:
+                    queue.append(m)
+        if placed != len(nodes):
+            return float('-inf')
+        total += weight
+    # log2 of a big integer mean, without converting it to a float first.
+    shift = max(total.bit_length() - 64, 0)
+    return math.log2(total >> shift) + shift - math.log2(samples)
@@ -1,10 +1,13 @@
 from mobase import IModList, IModInterface, ModState, IOrganizer # pyright: ignore [reportMissingModuleSource]
 import os
+from collections.abc import Callable
 from hashlib import sha256, file_digest
 import pathlib
 from plugin_oracle.util.mod.emap import efiles, ehashes
 from PyQt6.QtCore import qInfo
 
+_chunk: int = 1 << 20
+
 def allMods(mlist: IModList) -> list[IModInterface]:
     return [mlist.getMod(mod) for mod in mlist.allMods()]
 
@@ -20,14 +23,20 @@ def isActive(mod: IModInterface, mlist: IModList) -> bool:
 def isEssential(mod: IModInterface, mlist: IModList) -> bool:
     return (mlist.state(mod.name()) & ModState.ESSENTIAL) != 0
 
-def modhash(mod: IModInterface, organizer: IOrganizer) -> bytes:
+def installPath(mod: IModInterface, organizer: IOrganizer) -> str:
     path: str = mod.installationFile()
-    
+
     if '/' not in path:
         path = organizer.downloadsPath() + '/' + path
     else:
         username = os.getlogin()
         path = path.replace('USERNAME', username)
+    return path
+
+def modhash(mod: IModInterface, organizer: IOrganizer, digest: Callable[[str], bytes] | None = None) -> bytes:
+    path = installPath(mod, organizer)
+    if digest is not None:
+        return digest(path)
     with open(path, 'rb') as f:
         return file_digest(f, sha256).digest()
 
@@ -64,21 +73,20 @@ def esshash(mod: IModInterface) -> bytes:
     qInfo(f'{mod.name()} : {files}')
     if len(files) < 1:
         raise Exception(f'Missing files for {mod.name()}')
-    hashes: list[bytes] = []
+    # One context over the files in order digests exactly their concatenation.
+    h = sha256()
+    buf = bytearray(_chunk)
+    view = memoryview(buf)
     for path in files:
-        with open(path, 'rb') as f:
-            hashes.append(f.read())
-    combined = b''.join(hashes)
-    o = sha256(combined).digest()
+        with open(path, 'rb', buffering=0) as f:
+            while n := f.readinto(buf):
+                h.update(view[:n])
+    o = h.digest()
     qInfo(f'{mn}: bytes.fromhex(\'{o.hex()}\')')
     return o
 
-def setHash(mod: IModInterface, hash: bytes) -> None:
-    path: str = mod.absolutePath() + '/' + f'{hash.hex()}.oid.mohidden'
-    with open(path, 'wb') as f:
-        _ = f.write(hash)
-
 def getHash(mod: IModInterface) -> bytes | None:
+    """Hash left in the mod folder by older versions of the plugin, if any."""
     files = list(pathlib.Path(mod.absolutePath()).glob('*.oid.mohidden'))
     if len(files) < 1:
         return None
@@ -87,4 +95,6 @@ def getHash(mod: IModInterface) -> bytes | None:
     with open(files[0], 'rb') as f:
         return f.read()
 
-    
\ No newline at end of file
+def clearHash(mod: IModInterface) -> None:
+    for path in pathlib.Path(mod.absolutePath()).glob('*.oid.mohidden'):
+        path.unlink(missing_ok=True)
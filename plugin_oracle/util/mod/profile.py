@@ -0,0 +1,31 @@
+import os
+from collections.abc import Iterable, Iterator
+
+
+def profile_files(roots: Iterable[str]) -> Iterator[str]:
+    """
+    Walk profile directories and backups, yielding every `modlist*.txt*` file.
+
+    MO2's timestamped backups are picked up too. Plugin load orders
+    (`loadorder.txt`, `plugins.txt`) are not: plugin order and mod priority are
+    independent in MO2, so a plugin order says nothing about mod order.
+    """
+    for root in roots:
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames.sort()
+            for f in sorted(filenames, key=str.lower):
+                lf = f.lower()
+                if lf.startswith('modlist') and '.txt' in lf:
+                    yield os.path.join(dirpath, f)
+
+def read_modlist(path: str) -> list[str]:
+    """Enabled and unmanaged mods of a modlist.txt, lowest priority first."""
+    names: list[str] = []
+    with open(path, encoding='utf-8-sig', errors='replace') as f:
+        for line in f:
+            line = line.rstrip('\r\n')
+            if line[:1] in ('+', '*'):
+                names.append(line[1:])
+    # MO2 writes the highest priority mod first.
+    names.reverse()
+    return names
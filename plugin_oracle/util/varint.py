@@ -0,0 +1,31 @@
+def varint(buf: bytearray, v: int) -> None:
+    while v >= 0x80:
+        buf.append((v & 0x7f) | 0x80)
+        v >>= 7
+    buf.append(v)
+
+class Reader:
+    def __init__(self, data: bytes) -> None:
+        self.data: bytes = data
+        self.off: int = 0
+
+    def done(self) -> bool:
+        return self.off >= len(self.data)
+
+    def varint(self) -> int:
+        v = 0
+        shift = 0
+        while True:
+            b = self.data[self.off]
+            self.off += 1
+            v |= (b & 0x7f) << shift
+            if b < 0x80:
+                return v
+            shift += 7
+
+    def take(self, n: int) -> bytes:
+        out = self.data[self.off:self.off + n]
+        if len(out) != n:
+            raise ValueError('Truncated record')
+        self.off += n
+        return out
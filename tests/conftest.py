@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The plugin is not installed as a package; make it importable from a plain `pytest` run.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
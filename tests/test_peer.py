@@ -0,0 +1,81 @@
+import random
+from pathlib import Path
+
+from plugin_oracle.base.db import MDB
+from plugin_oracle.base.peer.node import Node
+from plugin_oracle.base.peer.transport import LocalTransport, Server, Transport
+from plugin_oracle.base.verify import Contradiction, Verifier
+
+def node(tmp_path: Path, name: str, hashes: list[bytes]) -> Node:
+    db = MDB()
+    _ = db.register_many(hashes)
+    return Node(db, str(tmp_path / name))
+
+def run(n: Node, rng: random.Random, hashes: list[bytes]) -> None:
+    result = rng.random() < 0.8
+    n.record({result: n.db.observe(result, rng.sample(hashes, rng.randint(2, 10)))})
+
+def rows(n: Node) -> tuple[dict[bytes, set[bytes]], dict[bytes, set[bytes]]]:
+    db = n.db
+    return tuple({db.hash(s): set(db.hashes(r)) for s, r in enumerate(db.rows(inv))} for inv in (True, False)) # pyright: ignore [reportReturnType]
+
+def round_trip(a: Node, b: Node, transport: Transport) -> None:
+    rng = random.Random(3)
+    hashes = [a.db.hash(s) for s in range(len(a.db))]
+    for _ in range(20):
+        run(a, rng, hashes)
+        run(b, rng, hashes)
+    _ = a.sync(transport)
+    # Both sides only queue what arrives until it is drained on their own thread.
+    assert a.drain() > 0
+    assert b.drain() > 0
+    assert rows(a) == rows(b)
+    assert a.clock == b.clock
+
+def test_local_round_trip(tmp_path: Path) -> None:
+    hashes = [bytes([i]) * 32 for i in range(30)]
+    a, b = node(tmp_path, 'a', hashes), node(tmp_path, 'b', hashes)
+    round_trip(a, b, LocalTransport(b))
+
+def test_tcp_round_trip(tmp_path: Path) -> None:
+    hashes = [bytes([i]) * 32 for i in range(30)]
+    a, b = node(tmp_path, 'a', hashes), node(tmp_path, 'b', hashes)
+    server = Server(b).start()
+    try:
+        round_trip(a, b, server.transport())
+    finally:
+        server.stop()
+
+def test_log_is_bounded(tmp_path: Path) -> None:
+    rng = random.Random(11)
+    hashes = [bytes([i]) * 32 for i in range(40)]
+    a = node(tmp_path, 'a', hashes)
+    for _ in range(2000):
+        run(a, rng, hashes)
+    assert len(a) <= 2 + Node._slack # pyright: ignore [reportPrivateUsage]
+    # Reopening keeps the folded log, and a fresh peer still catches up from it.
+    a = Node(a.db, str(tmp_path / 'a'))
+    assert len(a) <= 2 + Node._slack # pyright: ignore [reportPrivateUsage]
+    b = node(tmp_path, 'b', [])
+    _ = b.sync(LocalTransport(a))
+    _ = b.drain()
+    assert rows(b) == rows(a)
+
+def test_contradicting_rows_are_not_applied(tmp_path: Path) -> None:
+    x, y, z = (bytes([i]) * 32 for i in range(3))
+    a = node(tmp_path, 'a', [x, y, z])
+    db = MDB()
+    _ = db.register_many([x, y, z])
+    verifier = Verifier(db)
+    verifier.add([y, x])
+    b = Node(db, str(tmp_path / 'b'), verifier)
+    # `a` only ever saw x before y, which claims x must come first; b ran y before x fine.
+    a.record({True: a.db.observe(True, [x, y, z])})
+    _ = b.sync(LocalTransport(a))
+    report: list[Contradiction] = []
+    _ = b.drain(report)
+    assert [(c.mod, c.follower) for c in report] == [(x, y)]
+    assert Verifier.witness(report[0], [(False, [y, x]), (True, [z, y, x])]) == 1
+    assert x in db.fsets[y]
+    # z's row carried no contradiction and was taken.
+    assert x not in db.fsets[z] and y not in db.fsets[z]
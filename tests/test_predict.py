@@ -0,0 +1,49 @@
+import random
+
+from plugin_oracle.base.db import MDB
+from plugin_oracle.base.oracle.predict import Predictor
+
+def brute(db: MDB, order: list[bytes]) -> tuple[int, list[tuple[int, int]]]:
+    rows = db.rows()
+    slots = db.slots(order)
+    n = len(order)
+    bad = {i: {j for j in range(i + 1, n) if not (rows[slots[i]] >> slots[j]) & 1} for i in range(n)}
+    reach: dict[int, set[int]] = {}
+    for i in range(n - 1, -1, -1):
+        reach[i] = set(bad[i]).union(*(reach[j] for j in bad[i]))
+    minimal = sorted((i, j) for i in range(n) for j in bad[i] if not any(j in reach[k] for k in bad[i] if k != j))
+    return sum(len(b) for b in bad.values()), minimal
+
+def test_predict_matches_brute_force() -> None:
+    rng = random.Random(1)
+    hashes = [bytes([i]) * 32 for i in range(24)]
+    db = MDB()
+    _ = db.register_many(hashes)
+    predictor = Predictor(db)
+    for _ in range(300):
+        if rng.random() < 0.3:
+            seen = rng.sample(hashes, rng.randint(10, 24))
+            db.observe(rng.random() < 0.8, seen)
+        # Orders of the same length over different mods, as well as shuffles of one set.
+        order = rng.sample(hashes[:14], 12) if rng.random() < 0.5 else rng.sample(hashes[:16], 16)
+        if rng.random() < 0.5 and len(predictor._order) == len(order): # pyright: ignore [reportPrivateUsage]
+            order = list(predictor._order) # pyright: ignore [reportPrivateUsage]
+            a, b = rng.randrange(len(order)), rng.randrange(len(order))
+            order[a], order[b] = order[b], order[a]
+            # Swap one mod for one the order does not contain yet.
+            spare = [h for h in hashes if h not in order]
+            if spare and rng.random() < 0.5:
+                order[rng.randrange(len(order))] = rng.choice(spare)
+        result = predictor.predict(order)
+        assert (result.total, sorted(result.minimal)) == brute(db, order)
+
+def test_predict_different_mods_same_length() -> None:
+    hashes = [bytes([i]) * 32 for i in range(5)]
+    db = MDB()
+    _ = db.register_many(hashes)
+    db.observe(True, [hashes[2], hashes[0], hashes[1], hashes[3], hashes[4]])
+    predictor = Predictor(db)
+    _ = predictor.predict(hashes[:3])
+    order = [hashes[0], hashes[1], hashes[3]]
+    result = predictor.predict(order)
+    assert (result.total, sorted(result.minimal)) == brute(db, order)
@@ -0,0 +1,46 @@
+import random
+
+from plugin_oracle.base.db import MDB
+from plugin_oracle.util.ml.graph import Quotient
+
+def shape(q: Quotient) -> tuple[set[frozenset[int]], set[tuple[frozenset[int], frozenset[int]]]]:
+    """Classes and reduction edges, independent of how ties in the class order were broken."""
+    classes = [frozenset(m) for m in q.members]
+    edges = {(classes[c], classes[d]) for c in range(len(q)) for d in q.closure.successors(c)}
+    return set(classes), edges
+
+def test_update_matches_rebuild() -> None:
+    for seed in range(200):
+        rng = random.Random(seed)
+        n = rng.randint(2, 24)
+        hashes = [bytes([i]) * 32 for i in range(n)]
+        db = MDB()
+        _ = db.register_many(hashes)
+        slots = db.slots(rng.sample(hashes, rng.randint(1, n)))
+        q = Quotient(db.strict(slots), slots)
+        version = db.version
+        for _ in range(6):
+            for _ in range(rng.randint(1, 3)):
+                _ = db.observe(rng.random() < 0.7, rng.sample(hashes, rng.randint(2, n)))
+            removed = db.removed_since(version)
+            assert removed is not None
+            q.update(db.strict_changes(q.rows, q.of, removed))
+            version = db.version
+            fresh = Quotient(db.strict(slots), slots)
+            assert q.rows == fresh.rows
+            assert shape(q) == shape(fresh)
+            # Classes stay in topological order and the closure agrees on where every node is.
+            assert all(q.of[v] <= q.of[w] for v in slots for w in slots if (q.rows[v] >> w) & 1)
+            assert all(q.closure.of[v] == q.of[v] for v in slots)
+
+def test_removals_are_forgotten_past_the_limit() -> None:
+    hashes = [bytes([i]) * 32 for i in range(8)]
+    db = MDB()
+    _ = db.register_many(hashes)
+    version = db.version
+    for i in range(MDB._rlimit + 1): # pyright: ignore [reportPrivateUsage]
+        _ = db.remove(True, [(hashes[i % 8], [hashes[(i + 1 + i // 8) % 8]])])
+    assert db.removed_since(version) is None
+    assert db.removed_since(db.version) == []
+    db.reset()
+    assert db.removed_since(version) is None
@@ -0,0 +1,50 @@
+import random
+from pathlib import Path
+
+from plugin_oracle.base import relay
+from plugin_oracle.base.db import MDB
+
+def random_rows(rng: random.Random, n: int) -> tuple[list[int], list[int]]:
+    frows = [0] * n
+    irows = [0] * n
+    for v in range(n):
+        for _ in range(6):
+            w = rng.randrange(n)
+            # Mostly forward edges, with a few back edges to make cycles.
+            if w != v and (w > v or rng.random() < 0.2):
+                frows[v] |= 1 << w
+            w = rng.randrange(n)
+            if w != v:
+                irows[v] |= 1 << w
+    return frows, irows
+
+def test_relay_round_trip() -> None:
+    rng = random.Random(5)
+    for n in (0, 1, 2, 50, 400):
+        frows, irows = random_rows(rng, n)
+        hashes = [v.to_bytes(4, 'little') for v in range(n)]
+        names = [f'mod {v}' for v in range(n)]
+        assert relay.decode(relay.encode(4, hashes, names, frows, irows)) == (4, hashes, names, frows, irows)
+
+def test_relay_truncates_names_on_a_character_boundary() -> None:
+    name = 'a' * 0xfffe + 'é'
+    _, _, names, _, _ = relay.decode(relay.encode(4, [bytes(4)], [name], [0], [0]))
+    assert names == ['a' * 0xfffe]
+
+def test_export_import_round_trip(tmp_path: Path) -> None:
+    rng = random.Random(7)
+    hashes = [bytes([i]) * 32 for i in range(20)]
+    db = MDB()
+    _ = db.register_many(hashes)
+    for h in hashes:
+        db.rename(h, f'mod {h[0]}')
+    for _ in range(30):
+        db.observe(rng.random() < 0.8, rng.sample(hashes, rng.randint(5, 20)))
+    fname = str(tmp_path / 'db.orx')
+    db.export(fname)
+    out = MDB()
+    out.import_(fname)
+    assert [out.hash(s) for s in range(len(out))] == hashes
+    assert list(out.rows()) == list(db.rows())
+    assert list(out.rows(False)) == list(db.rows(False))
+    assert all(out.mod_req(h).name == db.mod_req(h).name for h in hashes)